@@ -97,7 +97,7 @@ def main():
 
                 with col2:
                     if st.button("🗑️", key=f"del_{i}"):
-                        handler.uploaded_files.remove(file)
+                        handler.remove_file(file)
                         st.rerun()
 
                 # 파일 정보 expander
@@ -108,14 +108,13 @@ def main():
                         st.dataframe(file.content.head(5), use_container_width=True)
 
                     elif file.type == 'image':
-                        import base64
-                        image_bytes = base64.b64decode(file.content)
-                        st.image(image_bytes)
+                        st.image(file.raw_bytes)
 
             st.divider()
 
             if st.button("🗑️ 모두 제거", use_container_width=True):
                 handler.clear_files()
+                st.session_state.analyst.release_context_cache()
                 st.session_state.chat_history = []
                 st.rerun()
 
@@ -230,15 +229,24 @@ def main():
                     try:
                         analyst = st.session_state.analyst
 
+                        # 응답을 생성되는 대로 표시
+                        response_area = st.empty()
+                        streamed = []
+
+                        def show_chunk(text):
+                            streamed.append(text)
+                            response_area.markdown("".join(streamed))
+
                         # 대화 컨텍스트 전달
                         result = analyst.analyze(
                             user_query,
                             include_images=True,
-                            conversation_context=st.session_state.conversation_context
+                            conversation_context=st.session_state.conversation_context,
+                            on_chunk=show_chunk
                         )
 
-                        # 응답 표시
-                        st.markdown(result.gemini_response)
+                        # 최종 응답 표시 (오류 메시지 등 스트리밍되지 않은 응답 포함)
+                        response_area.markdown(result.gemini_response)
 
                         # 테이블 표시
                         tables_to_save = []
@@ -3,40 +3,150 @@
 """
 import os
 import pickle
+import hashlib
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
 from sentence_transformers import SentenceTransformer
 import faiss
+import torch
 
 from config import EMBEDDING_MODEL_NAME, VECTOR_STORE_DIR
 from data_loader import Document
 
+# 캐시 인덱스 mmap 로드 플래그 (Flat 인덱스 코드까지 mmap 하려면 IO_FLAG_MMAP_IFC 필요)
+INDEX_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+# 쿼리 결과 캐시 (LRU) 최대 항목 수
+QUERY_CACHE_SIZE = 1000
+
+
+def _pickle_dump(obj, path):
+    """객체를 pickle 파일로 저장합니다."""
+    with open(path, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
 
 class VectorStore:
     """벡터 스토어 클래스 (FAISS 기반)"""
 
-    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        quantize: bool = False,
+        use_gpu_index: bool = False,
+        similarity_threshold: float = 1.0
+    ):
+        """
+        Args:
+            model_name: 임베딩 모델 이름
+            quantize: True면 PyTorch 모델의 Linear 레이어를 int8로 동적 양자화
+                      (도입 전 검증셋에서 MRR 하락이 1% 이내인지 확인할 것)
+            use_gpu_index: True면 검색을 GPU FAISS 인덱스로 수행 (디스크 저장은 CPU 인덱스)
+            similarity_threshold: 캐시된 쿼리와 코사인 유사도가 이 값 이상이면 캐시 결과 재사용
+                                  (1.0이면 임베딩 시그니처가 같은 쿼리만 재사용)
+        """
         self.model_name = model_name
+        self.quantize = quantize
+        self.use_gpu_index = use_gpu_index
+        self.similarity_threshold = similarity_threshold
         self.model = None
+        self.backend = None  # 'onnx', 'openvino', 'torch'
+        self.device = None  # 'cuda' or 'cpu'
         self.index = None
-        self.documents = []
+        self.gpu_index = None  # 검색 전용 GPU 복사본
+        self.gpu_resources = None
+        # 쿼리 캐시: (임베딩 시그니처, top_k, dataset_filter) → (쿼리 임베딩, 결과)
+        self._query_cache = OrderedDict()
+        self.index_mmapped = False  # 읽기 전용 mmap 인덱스 여부
+        # 문서는 컬럼 단위로 보관 (텍스트/메타데이터 object 배열, 순서 동일)
+        self._texts = np.empty(0, dtype=object)
+        self._metadata = np.empty(0, dtype=object)
+        self._doc_dataset = np.empty(0, dtype=object)  # 문서별 metadata['dataset'] (검색 필터용)
+        self.doc_hashes = np.empty(0, dtype='S16')  # 문서별 blake2b 해시 (문서와 순서 동일)
+        self.doc_ids = np.empty(0, dtype=np.int64)  # 문서별 FAISS ID (오름차순 유지)
+        self.documents_hash = None  # 캐시된 전체 문서 다이제스트
         self.dimension = None
 
         # 캐시 파일 경로
         self.index_path = VECTOR_STORE_DIR / "faiss_index.bin"
         self.docs_path = VECTOR_STORE_DIR / "documents.pkl"
         self.config_path = VECTOR_STORE_DIR / "config.pkl"
+        self.hashes_path = VECTOR_STORE_DIR / "docs_hashes.npy"
+        self.ids_path = VECTOR_STORE_DIR / "doc_ids.npy"
 
         # 벡터 스토어 디렉토리 생성
         VECTOR_STORE_DIR.mkdir(exist_ok=True, parents=True)
 
+    @property
+    def documents(self) -> List[Document]:
+        """저장된 문서 리스트 (호출 시 Document 객체 생성)"""
+        return [Document(text, metadata) for text, metadata in zip(self._texts, self._metadata)]
+
+    def _set_documents(self, documents: List[Document]):
+        """문서 리스트를 텍스트/메타데이터 배열로 분해해 저장합니다."""
+        count = len(documents)
+        self._texts = np.fromiter((doc.text for doc in documents), dtype=object, count=count)
+        self._metadata = np.fromiter((doc.metadata for doc in documents), dtype=object, count=count)
+        self._doc_dataset = self._extract_datasets(self._metadata)
+
+    @staticmethod
+    def _extract_datasets(metadata: np.ndarray) -> np.ndarray:
+        """메타데이터 배열에서 dataset 값만 배열로 추출합니다."""
+        return np.fromiter((m.get("dataset") for m in metadata), dtype=object, count=len(metadata))
+
     def _load_model(self):
         """임베딩 모델을 로드합니다."""
         if self.model is None:
             print(f"\n🤖 임베딩 모델 로딩 중: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
+
+            # CPU 코어 수만큼 스레드 사용 (과다/과소 구독 방지)
+            torch.set_num_threads(os.cpu_count() or 1)
+
+            # GPU가 있으면 GPU로 인코딩 (int8 동적 양자화는 CPU 전용)
+            self.device = "cuda" if torch.cuda.is_available() and not self.quantize else "cpu"
+
+            self.model = self._create_model()
+
+            if self.quantize and self.backend == "torch":
+                self._quantize_model()
+
             self.dimension = self.model.get_sentence_embedding_dimension()
-            print(f"✓ 모델 로드 완료 (차원: {self.dimension})")
+            print(f"✓ 모델 로드 완료 (차원: {self.dimension}, 백엔드: {self.backend}, 장치: {self.device})")
+
+    def _create_model(self) -> SentenceTransformer:
+        """
+        가능하면 ONNX Runtime / OpenVINO 백엔드로 모델을 생성합니다.
+        (풀링/정규화는 SentenceTransformer가 동일하게 처리)
+
+        Returns:
+            SentenceTransformer 모델 (실패 시 PyTorch 기본 백엔드)
+        """
+        # 양자화는 PyTorch 모델에만 적용 가능
+        backends = () if self.quantize else ("onnx", "openvino")
+
+        for backend in backends:
+            try:
+                model = SentenceTransformer(self.model_name, backend=backend, device=self.device)
+                self.backend = backend
+                return model
+            except Exception as e:
+                # optimum 미설치, 구버전 sentence-transformers 등
+                print(f"  ⚠ {backend} 백엔드 사용 불가: {e}")
+
+        self.backend = "torch"
+        return SentenceTransformer(self.model_name, device=self.device)
+
+    def _quantize_model(self):
+        """Linear 레이어를 int8로 동적 양자화합니다. (CPU 전용)"""
+        try:
+            self.model = torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            self.backend = "torch-int8"
+        except Exception as e:
+            # 양자화 실패 시 FP32 모델 그대로 사용
+            print(f"  ⚠ int8 양자화 실패 (FP32 유지): {e}")
 
     def build_index(self, documents: List[Document], force_rebuild: bool = False):
         """
@@ -46,9 +156,17 @@ class VectorStore:
             documents: 문서 리스트
             force_rebuild: 강제로 재생성 여부
         """
-        # 캐시된 인덱스 확인
+        # 인덱스가 바뀌므로 쿼리 캐시 초기화
+        self._query_cache.clear()
+
+        # 캐시된 인덱스가 있으면 문서 다이제스트로 검증 후 변경된 문서만 반영
         if not force_rebuild and self._load_from_cache():
-            print("✓ 캐시된 벡터 인덱스 로드 완료")
+            doc_hashes = self._hash_texts(doc.text for doc in documents)
+            if self._documents_digest(doc_hashes) == self.documents_hash:
+                print("✓ 캐시된 벡터 인덱스 로드 완료 (문서 변경 없음)")
+            else:
+                self._update_index(documents, doc_hashes)
+            self._sync_gpu_index()
             return
 
         print(f"\n🔨 벡터 인덱스 생성 중... (문서 수: {len(documents)})")
@@ -57,29 +175,138 @@ class VectorStore:
         self._load_model()
 
         # 문서 저장
-        self.documents = documents
-
-        # 텍스트 추출
-        texts = [doc.text for doc in documents]
+        self._set_documents(documents)
+        self.doc_hashes = self._hash_texts(self._texts)
+        self.doc_ids = np.arange(len(self._texts), dtype=np.int64)
 
         # 임베딩 생성
         print("  임베딩 생성 중...")
-        embeddings = self.model.encode(
-            texts,
-            show_progress_bar=True,
-            convert_to_numpy=True,
-            normalize_embeddings=True  # 코사인 유사도를 위해 정규화
-        )
+        embeddings = self._encode_texts(self._texts.tolist())
 
-        # FAISS 인덱스 생성
+        # FAISS 인덱스 생성 (증분 갱신을 위해 ID 매핑 사용)
+        # Inner Product (정규화된 벡터라면 코사인 유사도), FP16 저장으로 메모리/캐시 파일 크기 절반
         print("  FAISS 인덱스 구축 중...")
-        self.index = faiss.IndexFlatIP(self.dimension)  # Inner Product (정규화된 벡터라면 코사인 유사도)
-        self.index.add(embeddings.astype('float32'))
+        self.index = faiss.IndexIDMap2(faiss.IndexScalarQuantizer(
+            self.dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+        ))
+        self.index_mmapped = False
+        self.index.add_with_ids(embeddings, self.doc_ids)
 
         print(f"✓ 인덱스 생성 완료 (총 {self.index.ntotal} 벡터)")
 
         # 캐시 저장
         self._save_to_cache()
+        self._sync_gpu_index()
+
+    def _sync_gpu_index(self):
+        """use_gpu_index가 켜져 있으면 CPU 인덱스를 GPU로 복사합니다."""
+        self.gpu_index = None
+        if not self.use_gpu_index:
+            return
+
+        if not hasattr(faiss, "StandardGpuResources") or faiss.get_num_gpus() == 0:
+            print("  ⚠ GPU FAISS를 사용할 수 없어 CPU 인덱스로 검색합니다.")
+            return
+
+        try:
+            # GPU는 Flat SQ 인덱스를 지원하지 않으므로 벡터를 복원해 FP16 GPU Flat 인덱스로 복사
+            flat_index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+            flat_index.add_with_ids(
+                faiss.downcast_index(self.index.index).reconstruct_n(0, self.index.ntotal),
+                faiss.vector_to_array(self.index.id_map)
+            )
+
+            options = faiss.GpuClonerOptions()
+            options.useFloat16 = True
+            self.gpu_resources = faiss.StandardGpuResources()
+            self.gpu_index = faiss.index_cpu_to_gpu(self.gpu_resources, 0, flat_index, options)
+            print(f"✓ GPU 인덱스 준비 완료 ({self.gpu_index.ntotal} 벡터)")
+        except Exception as e:
+            print(f"  ⚠ GPU 인덱스 생성 실패 (CPU 사용): {e}")
+
+    def _update_index(self, documents: List[Document], new_hashes: np.ndarray):
+        """
+        캐시된 인덱스와 문서를 비교해 추가/삭제/수정된 문서만 반영합니다.
+
+        Args:
+            documents: 최신 문서 리스트
+            new_hashes: documents의 문서별 해시 (_hash_texts 결과)
+        """
+
+        # 기존 해시 → 위치 (동일 텍스트 문서가 여러 개일 수 있음)
+        old_positions = defaultdict(list)
+        for pos, doc_hash in enumerate(self.doc_hashes):
+            old_positions[doc_hash].append(pos)
+
+        kept = {}  # 기존 위치 → 새 문서 위치
+        added = []  # 새로 인코딩할 문서 위치
+        for i, doc_hash in enumerate(new_hashes):
+            if old_positions[doc_hash]:
+                kept[old_positions[doc_hash].pop()] = i
+            else:
+                added.append(i)
+
+        stale = [pos for positions in old_positions.values() for pos in positions]
+
+        if not added and not stale:
+            print("✓ 캐시된 벡터 인덱스 로드 완료 (변경 없음)")
+            return
+
+        print(f"\n🔄 벡터 인덱스 증분 갱신 중... (추가 {len(added)}개, 삭제 {len(stale)}개)")
+
+        # 읽기 전용 mmap 인덱스는 수정할 수 없으므로 메모리로 다시 로드
+        if self.index_mmapped:
+            self.index = faiss.read_index(str(self.index_path))
+            self.index_mmapped = False
+
+        # 삭제된 문서 제거
+        if stale:
+            self.index.remove_ids(self.doc_ids[stale])
+
+        # 새 문서만 인코딩하여 추가
+        next_id = int(self.doc_ids.max()) + 1 if len(self.doc_ids) else 0
+        new_ids = np.arange(next_id, next_id + len(added), dtype=np.int64)
+        if added:
+            embeddings = self._encode_texts([documents[i].text for i in added])
+            self.index.add_with_ids(embeddings, new_ids)
+
+        # 문서/해시/ID 정렬 유지 (기존 순서 + 추가분)
+        kept_positions = sorted(kept)
+        self._set_documents([documents[kept[pos]] for pos in kept_positions] + [documents[i] for i in added])
+        self.doc_hashes = np.concatenate([self.doc_hashes[kept_positions], new_hashes[added]])
+        self.doc_ids = np.concatenate([self.doc_ids[kept_positions], new_ids])
+
+        print(f"✓ 인덱스 갱신 완료 (총 {self.index.ntotal} 벡터)")
+
+        # 캐시 저장
+        self._save_to_cache()
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """텍스트 리스트를 임베딩합니다. (float32, C-contiguous, L2 정규화)"""
+        embeddings = self.model.encode(
+            texts,
+            show_progress_bar=len(texts) > 1,
+            convert_to_numpy=True
+        )
+        # encode 결과는 이미 float32이므로 보통 복사 없이 그대로 반환됨
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+        # 코사인 유사도를 위해 정규화 (모델 내부 연산 대신 FAISS 커널로 in-place 처리)
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+    @staticmethod
+    def _hash_texts(texts: Iterable[str]) -> np.ndarray:
+        """문서 텍스트별 blake2b 해시(16바이트) 배열을 생성합니다."""
+        return np.array(
+            [hashlib.blake2b(text.encode(), digest_size=16).digest() for text in texts],
+            dtype='S16'
+        )
+
+    @staticmethod
+    def _documents_digest(doc_hashes: np.ndarray) -> str:
+        """문서 순서와 무관한 전체 문서 다이제스트를 생성합니다."""
+        return hashlib.blake2b(np.sort(doc_hashes).tobytes()).hexdigest()
 
     def search(self, query: str, top_k: int = 5, dataset_filter: str = "전체") -> List[Tuple[Document, float]]:
         """
@@ -98,57 +325,97 @@ class VectorStore:
             return []
 
         # 쿼리 임베딩 생성
-        query_embedding = self.model.encode(
-            [query],
-            convert_to_numpy=True,
-            normalize_embeddings=True
-        ).astype('float32')
-
-        # 검색 (더 많이 가져온 후 필터링)
-        search_k = min(top_k * 10, self.index.ntotal)
-        distances, indices = self.index.search(query_embedding, search_k)
-
-        # 결과 필터링 및 정리
-        results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx >= len(self.documents):
-                continue
+        query_embedding = self._encode_texts([query])
+
+        # 의미적으로 같은 쿼리는 캐시된 결과 재사용
+        cache_key = (np.round(query_embedding[0] * 127).astype(np.int8).tobytes(), top_k, dataset_filter)
+        cached = self._lookup_query_cache(cache_key, query_embedding[0])
+        if cached is not None:
+            return list(cached)
+
+        # 검색 (더 많이 가져온 후 필터링, GPU 인덱스 우선)
+        index = self.gpu_index if self.gpu_index is not None else self.index
+        search_k = min(top_k * 10, index.ntotal)
+        distances, indices = index.search(query_embedding, search_k)
+
+        # 빈 결과(-1) 제거 후 FAISS ID → 문서 위치 (doc_ids는 오름차순)
+        ids = indices[0]
+        valid = ids >= 0
+        scores = distances[0][valid]
+        positions = np.searchsorted(self.doc_ids, ids[valid])
+
+        # 데이터셋 필터 적용 (배열 연산)
+        if dataset_filter != "전체":
+            keep = self._doc_dataset[positions] == dataset_filter
+            positions = positions[keep]
+            scores = scores[keep]
+
+        # 상위 top_k개만 Document 객체로 생성
+        texts = self._texts
+        metadata = self._metadata
+        results = [
+            (Document(texts[pos], metadata[pos]), float(score))
+            for pos, score in zip(positions[:top_k], scores[:top_k])
+        ]
+
+        # 쿼리 캐시 저장 (LRU)
+        self._query_cache[cache_key] = (query_embedding[0], results)
+        if len(self._query_cache) > QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+
+        return list(results)
+
+    def _lookup_query_cache(self, cache_key: tuple, query_embedding: np.ndarray):
+        """
+        쿼리 캐시에서 결과를 찾습니다.
 
-            doc = self.documents[idx]
+        Args:
+            cache_key: (임베딩 시그니처, top_k, dataset_filter)
+            query_embedding: 정규화된 쿼리 임베딩
 
-            # 데이터셋 필터 적용
-            if dataset_filter != "전체":
-                if doc.metadata.get("dataset") != dataset_filter:
-                    continue
+        Returns:
+            캐시된 결과 리스트 또는 None
+        """
+        if cache_key in self._query_cache:
+            self._query_cache.move_to_end(cache_key)
+            return self._query_cache[cache_key][1]
 
-            score = float(dist)
-            results.append((doc, score))
+        if self.similarity_threshold >= 1.0:
+            return None
 
-            if len(results) >= top_k:
-                break
+        # 같은 조건(top_k, 필터)으로 캐시된 쿼리 중 충분히 유사한 것 재사용
+        for key, (cached_embedding, results) in self._query_cache.items():
+            if key[1:] == cache_key[1:] and float(cached_embedding @ query_embedding) >= self.similarity_threshold:
+                self._query_cache.move_to_end(key)
+                return results
 
-        return results
+        return None
 
     def _save_to_cache(self):
         """벡터 인덱스를 디스크에 저장합니다."""
         print(f"\n💾 벡터 인덱스 캐싱 중...")
 
         try:
-            # FAISS 인덱스 저장
-            faiss.write_index(self.index, str(self.index_path))
-
-            # 문서 저장
-            with open(self.docs_path, 'wb') as f:
-                pickle.dump(self.documents, f)
-
-            # 설정 저장
+            # 설정
             config = {
                 'model_name': self.model_name,
                 'dimension': self.dimension,
-                'num_documents': len(self.documents)
+                'num_documents': len(self._texts),
+                'documents_hash': self._documents_digest(self.doc_hashes)
             }
-            with open(self.config_path, 'wb') as f:
-                pickle.dump(config, f)
+
+            # 인덱스(I/O 위주)와 문서 pickle(CPU 위주) 등을 동시에 저장
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                futures = [
+                    executor.submit(faiss.write_index, self.index, str(self.index_path)),
+                    executor.submit(_pickle_dump, {'texts': self._texts, 'metadata': self._metadata}, self.docs_path),
+                    executor.submit(_pickle_dump, config, self.config_path),
+                    # 문서 해시/ID (증분 갱신용)
+                    executor.submit(np.save, self.hashes_path, self.doc_hashes),
+                    executor.submit(np.save, self.ids_path, self.doc_ids),
+                ]
+                for future in futures:
+                    future.result()
 
             print(f"✓ 캐시 저장 완료: {VECTOR_STORE_DIR}")
 
@@ -162,7 +429,8 @@ class VectorStore:
         Returns:
             성공 여부
         """
-        if not (self.index_path.exists() and self.docs_path.exists() and self.config_path.exists()):
+        cache_paths = [self.index_path, self.docs_path, self.config_path, self.hashes_path, self.ids_path]
+        if not all(path.exists() for path in cache_paths):
             return False
 
         try:
@@ -180,16 +448,26 @@ class VectorStore:
             # 모델 로드
             self._load_model()
 
-            # FAISS 인덱스 로드
-            self.index = faiss.read_index(str(self.index_path))
+            # FAISS 인덱스 로드 (mmap: 필요한 페이지만 OS 페이지 캐시에서 읽음)
+            # build_index는 Flat 계열(FP16 SQ) 레이아웃으로 저장하므로 그대로 mmap 가능
+            self.index = faiss.read_index(str(self.index_path), INDEX_MMAP_FLAGS)
+            self.index_mmapped = True
 
             # 문서 로드
             with open(self.docs_path, 'rb') as f:
-                self.documents = pickle.load(f)
+                docs = pickle.load(f)
+            self._texts = docs['texts']
+            self._metadata = docs['metadata']
+            self._doc_dataset = self._extract_datasets(self._metadata)
+
+            # 문서 해시/ID 로드
+            self.doc_hashes = np.load(self.hashes_path)
+            self.doc_ids = np.load(self.ids_path)
 
             self.dimension = config['dimension']
+            self.documents_hash = config.get('documents_hash')
 
-            print(f"✓ 캐시 로드 완료: {len(self.documents)} 문서, {self.index.ntotal} 벡터")
+            print(f"✓ 캐시 로드 완료: {len(self._texts)} 문서, {self.index.ntotal} 벡터")
             return True
 
         except Exception as e:
@@ -198,7 +476,7 @@ class VectorStore:
 
     def clear_cache(self):
         """캐시를 삭제합니다."""
-        for path in [self.index_path, self.docs_path, self.config_path]:
+        for path in [self.index_path, self.docs_path, self.config_path, self.hashes_path, self.ids_path]:
             if path.exists():
                 path.unlink()
         print("✓ 캐시 삭제 완료")
@@ -3,18 +3,109 @@
 업로드된 데이터를 자동 분석하고 Gemini로 인사이트 제공
 """
 import google.generativeai as genai
+from google.generativeai import caching
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from dataclasses import dataclass
-import base64
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import re
+import hashlib
+import threading
+import time
+import weakref
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 from config import GOOGLE_API_KEY
-from upload_handler import UploadHandler, UploadedFile
+from upload_handler import UploadHandler, UploadedFile, profile_columns
 
 
 # Gemini API 설정
 genai.configure(api_key=GOOGLE_API_KEY)
 
+# 질문 분류 키워드
+RANK_KW = frozenset(['상위', 'top', '많이', '높은', '순위'])
+AGG_KW = frozenset(['합계', '총', '평균', '총합'])
+LIST_KW = frozenset(['전체', '모든', '리스트', '목록'])
+COMPANY_KW = frozenset(['회사', '거래처', '업체'])
+TOP_TABLE_KW = frozenset(['상위', 'Top', '순위'])
+
+# 키워드 추출 시 제외할 불용어
+STOPWORDS = frozenset(['을', '를', '이', '가', '은', '는', '의', '에', '에서', '으로', '부터', '까지',
+                       '해', '해주', '해줘', '알려', '알려줘', '보여', '보여줘', '분석', '설명'])
+
+
+def _keyword_pattern(keywords: frozenset) -> re.Pattern:
+    """키워드 중 하나라도 질문에 포함되는지 한 번에 검사하는 정규식 (부분 문자열 매칭)"""
+    return re.compile('|'.join(re.escape(word) for word in sorted(keywords)))
+
+
+RANK_PATTERN = _keyword_pattern(RANK_KW)
+AGG_PATTERN = _keyword_pattern(AGG_KW)
+LIST_PATTERN = _keyword_pattern(LIST_KW)
+COMPANY_PATTERN = _keyword_pattern(COMPANY_KW)
+TOP_TABLE_PATTERN = _keyword_pattern(TOP_TABLE_KW)
+
+# 샘플 데이터 출력 시 최대 컬럼 수
+SAMPLE_MAX_COLS = 15
+
+
+def _sample_to_text(df: pd.DataFrame, index: bool = True) -> str:
+    """샘플 DataFrame을 '|' 구분 텍스트로 변환 (컬럼 수 제한, C 기반 CSV writer 사용)"""
+    return df.iloc[:, :SAMPLE_MAX_COLS].to_csv(sep='|', index=index, lineterminator='\n').rstrip('\n')
+
+
+def _ranking_to_text(ranking: pd.Series, key_label: str, value_label: str) -> str:
+    """정렬된 집계 Series를 '순위|키|값' 형식으로 변환 (행별 f-string 대신 pandas 포매터로 한 번에 출력)"""
+    out = ranking.rename(value_label).rename_axis(key_label).reset_index()
+    out.insert(0, '순위', range(1, len(out) + 1))
+    return out.to_csv(sep='|', index=False, float_format='%.0f', lineterminator='\n').rstrip('\n')
+
+
+# 프롬프트는 고정 부분(역할/규칙/데이터)을 앞에, 가변 부분(대화/질문)을 뒤에 배치
+# → 공통 prefix가 유지되어 Gemini 암묵적 캐시 적중
+
+# 명시적 컨텍스트 캐시 설정 (Gemini 2.5 Pro 최소 캐시 토큰 수: 4096)
+CONTEXT_CACHE_MIN_TOKENS = 4096
+CONTEXT_CACHE_TTL = datetime.timedelta(hours=1)
+CONTEXT_CACHE_MAX_ENTRIES = 8  # 동시에 유지할 최대 캐시 수 (초과 시 오래 안 쓴 캐시부터 삭제)
+PROMPT_VERSION = "v3"  # 아래 프롬프트 문구를 바꾸면 올려서 기존 캐시 무효화
+
+ANALYST_ROLE = """당신은 **비즈니스 데이터 분석 전문가**입니다.
+
+사용자가 업로드한 데이터를 바탕으로 질문에 답변하세요."""
+
+ANALYSIS_GUIDE = """**답변 작성 가이드**:
+1. **데이터 요약**: 업로드된 데이터의 핵심 내용
+2. **질문에 대한 답변**: 구체적인 수치와 함께 명확히 답변
+3. **인사이트 및 AI 판단**:
+   - 데이터에서 발견한 중요한 패턴/특징
+   - **연평균 성장률 (CAGR)**: 연도별 데이터가 있으면 성장률 계산 공식 = ((최종년도값/초기년도값)^(1/(년수-1)) - 1) × 100
+   - **거래 끊길 위험 분석**: 최근 3개월 매출이 이전 3개월 대비 50% 이상 감소한 거래처, 또는 거래 빈도가 급격히 줄어든 거래처
+   - **고객 등급별 특징**: R(Recency), F(Frequency), M(Monetary) 기준 충성고객, 잠재고객, 위험고객 분류
+   - **제품군별 트렌드**: 특정 제품군 매출 증가/감소 추세
+4. **제안 및 조언**:
+   - 의사결정에 도움되는 구체적 조언
+   - 주의가 필요한 거래처/제품
+   - 추가 분석이 필요한 부분
+
+**중요 - 반드시 지켜야 할 규칙**:
+- 한국어로 답변
+- **데이터 정보의 "계산된 결과" 섹션에 있는 실제 회사명/제품명만 사용할 것**
+- **절대로 존재하지 않는 회사명을 지어내지 말 것 (예: "주식회사 가나다라", "베스트출판" 같은 가짜 이름 금지)**
+- **중국어 기업명을 한국어로 번역하지 말 것 (예: "쓰촨쉬홍 OPTO-전자"는 원문 그대로 사용)**
+- 구체적인 숫자/사실만 언급
+- 데이터에 없는 내용은 추측하지 말고 "데이터에 없음"이라고 명시
+- 제공된 pandas 계산 결과를 우선적으로 활용
+- 거래처 코드가 주어지면 반드시 거래처명으로 변환해서 답변
+- NULL/빈 값은 "데이터 없음" 또는 "-"로 표시"""
+
 
 @dataclass
 class AnalysisResult:
@@ -32,9 +123,24 @@ class SmartAnalyst:
     def __init__(self, upload_handler: UploadHandler):
         self.upload_handler = upload_handler
         self.llm = genai.GenerativeModel('gemini-2.5-pro')  # 최신 Pro 모델
+        # data_context 해시 → (CachedContent 또는 None(캐시 불가), 만료 시각), 최근 사용 순
+        self._cache_map: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cache_seen: set = set()  # 한 번 사용된 data_context 해시 (두 번째 사용 시 캐시 생성)
+        self._cache_fingerprint: Optional[str] = None  # 캐시를 만든 업로드 파일 지문
+        self._cache_lock = threading.Lock()
+        # id(df) → (df 약한 참조, 거래처명 Aho-Corasick 오토마톤)
+        self._company_automaton: Dict[int, tuple] = {}
+        self._automaton_lock = threading.Lock()  # _find_relevant_data가 여러 스레드에서 실행됨
+        # 업로드 파일 지문 → 조인 결과 / (지문, 이미지 포함 여부, 질문 형태) → data_context
+        self._context_fingerprint: Optional[str] = None
+        self._joined_df: Optional[pd.DataFrame] = None
+        self._context_cache: Dict[tuple, str] = {}
         print("✓ 스마트 분석기 초기화 (Gemini 2.5 Pro)")
 
-    def analyze(self, query: str, include_images: bool = True, conversation_context=None) -> AnalysisResult:
+    def analyze(
+        self, query: str, include_images: bool = True, conversation_context=None,
+        on_chunk: Optional[Callable[[str], None]] = None
+    ) -> AnalysisResult:
         """
         질문에 대한 분석 수행 (대화 컨텍스트 지원)
 
@@ -42,6 +148,7 @@ class SmartAnalyst:
             query: 사용자 질문
             include_images: 이미지 포함 여부
             conversation_context: 이전 대화 컨텍스트 (최근 3개)
+            on_chunk: Gemini 응답 조각을 받을 콜백 (스트리밍 표시용, 호출 스레드에서 실행)
 
         Returns:
             AnalysisResult
@@ -55,11 +162,16 @@ class SmartAnalyst:
         # 1. 데이터 컨텍스트 구성
         data_context = self._build_data_context(query, include_images)
 
-        # 2. Gemini 분석 (대화 컨텍스트 포함)
-        gemini_response = self._generate_analysis(query, data_context, include_images, conversation_context)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # 2. 결과 테이블/차트 추출 (필요시) - Gemini 응답을 기다리는 동안 백그라운드에서 계산
+            results_future = executor.submit(self._extract_results, query, data_context)
+
+            # 3. Gemini 분석 (대화 컨텍스트 포함)
+            gemini_response = self._generate_analysis(
+                query, data_context, include_images, conversation_context, on_chunk
+            )
 
-        # 3. 결과 테이블/차트 추출 (필요시)
-        tables, charts = self._extract_results(query, data_context)
+            tables, charts = results_future.result()
 
         return AnalysisResult(
             query=query,
@@ -69,21 +181,87 @@ class SmartAnalyst:
             tables=tables
         )
 
+    def analyze_batch(self, queries: List[str], include_images: bool = True) -> List[AnalysisResult]:
+        """
+        같은 데이터에 대한 여러 질문을 한 번에 분석 (대시보드용 정형 질문 등)
+
+        데이터 컨텍스트는 순서대로 구성하고(같은 파일이면 캐시 재사용),
+        대부분 네트워크 대기인 Gemini 호출만 병렬로 수행
+
+        Args:
+            queries: 사용자 질문 목록
+            include_images: 이미지 포함 여부
+
+        Returns:
+            질문 순서대로 AnalysisResult 목록
+        """
+        print(f"\n{'='*60}")
+        print(f"🔍 일괄 분석: {len(queries)}개 질문")
+        print(f"{'='*60}")
+
+        if not queries:
+            return []
+
+        # 1. 데이터 컨텍스트 구성 (pandas 계산은 순차 실행)
+        data_contexts = [self._build_data_context(query, include_images) for query in queries]
+
+        with ThreadPoolExecutor(max_workers=min(8, len(queries))) as executor:
+            # 2. Gemini 분석 병렬 요청
+            response_futures = [
+                executor.submit(self._generate_analysis, query, data_context, include_images)
+                for query, data_context in zip(queries, data_contexts)
+            ]
+
+            # 3. 응답을 기다리는 동안 결과 테이블/차트 추출
+            extracted = [
+                self._extract_results(query, data_context)
+                for query, data_context in zip(queries, data_contexts)
+            ]
+
+            responses = [future.result() for future in response_futures]
+
+        return [
+            AnalysisResult(
+                query=query,
+                data_context=data_context,
+                gemini_response=gemini_response,
+                charts=charts,
+                tables=tables
+            )
+            for query, data_context, gemini_response, (tables, charts)
+            in zip(queries, data_contexts, responses, extracted)
+        ]
+
     def _build_data_context(self, query: str, include_images: bool) -> str:
         """데이터 컨텍스트 구성 - 다중 파일 조인 지원"""
         print("📊 데이터 컨텍스트 구성 중...")
 
+        # 업로드 파일이 바뀌면 조인 결과와 컨텍스트 캐시 무효화
+        fingerprint = self._files_fingerprint()
+        dataframes = self.upload_handler.get_all_dataframes()
+        if fingerprint != self._context_fingerprint:
+            self._context_fingerprint = fingerprint
+            self._context_cache.clear()
+            self._joined_df = self._join_dataframes(dataframes) if len(dataframes) > 1 else None
+        joined_df = self._joined_df
+
+        # 같은 파일 + 같은 형태의 질문이면 pandas 계산 결과가 동일하므로 재사용
+        target_dfs = [joined_df] if joined_df is not None else list(dataframes.values())
+        cache_key = (fingerprint, include_images, self._query_shape(query, target_dfs))
+        cached = self._context_cache.get(cache_key)
+        if cached is not None:
+            print("✓ 데이터 컨텍스트 캐시 사용")
+            return cached
+
         context_parts = []
         context_parts.append("=== 업로드된 데이터 ===\n")
 
         # DataFrame 데이터
-        dataframes = self.upload_handler.get_all_dataframes()
         if dataframes:
             context_parts.append(f"**테이블 데이터** ({len(dataframes)}개 파일):\n")
 
             # 여러 파일이 있고 거래처 기준 조인 가능한 경우
             if len(dataframes) > 1:
-                joined_df = self._join_dataframes(dataframes)
                 if joined_df is not None:
                     context_parts.append(f"\n[통합 데이터 (거래처 기준 조인)]")
                     context_parts.append(f"- 총 행 수: {len(joined_df):,}")
@@ -101,13 +279,19 @@ class SmartAnalyst:
                     for filename, df in dataframes.items():
                         context_parts.append(f"- {filename}: {len(df):,}행, {len(df.columns)}열")
                 else:
-                    # 조인 실패 시 개별 파일로 분석
-                    for filename, df in dataframes.items():
+                    # 조인 실패 시 개별 파일로 분석 (파일별 pandas 계산은 독립적이므로 병렬 실행)
+                    with ThreadPoolExecutor(max_workers=min(8, len(dataframes))) as executor:
+                        futures = [
+                            executor.submit(self._find_relevant_data, query, df, filename)
+                            for filename, df in dataframes.items()
+                        ]
+
+                    for (filename, df), future in zip(dataframes.items(), futures):
                         context_parts.append(f"\n[{filename}]")
                         context_parts.append(f"- 행 수: {len(df):,}")
                         context_parts.append(f"- 열: {', '.join(df.columns[:10].tolist())}")
 
-                        relevant_data = self._find_relevant_data(query, df, filename)
+                        relevant_data = future.result()
                         if relevant_data:
                             context_parts.append(f"\n관련 데이터:")
                             context_parts.append(relevant_data)
@@ -131,7 +315,35 @@ class SmartAnalyst:
                 for img_file in images:
                     context_parts.append(f"- {img_file.name}")
 
-        return "\n".join(context_parts)
+        data_context = "\n".join(context_parts)
+        self._context_cache[cache_key] = data_context
+        return data_context
+
+    def _files_fingerprint(self) -> str:
+        """업로드된 파일 목록의 지문 (이름, 타입, 크기, 내용 객체)"""
+        entries = sorted(
+            (f.name, f.type, f.size, id(f.content)) for f in self.upload_handler.uploaded_files
+        )
+        return hashlib.sha1(repr(entries).encode('utf-8')).hexdigest()
+
+    def _query_shape(self, query: str, dfs: List[pd.DataFrame]) -> tuple:
+        """_find_relevant_data 결과를 결정하는 질문 요소 (질문 유형, N, 거래처명, 매칭 컬럼)"""
+        n = next((word for word in query.split() if word.isdigit()), None)
+        keywords = self._extract_keywords(query)
+        per_df = tuple(
+            (
+                self._extract_company_name(query, df),
+                tuple(col for col in df.columns if any(keyword in str(col).lower() for keyword in keywords)),
+            )
+            for df in dfs
+        )
+        return (
+            bool(RANK_PATTERN.search(query)),
+            bool(AGG_PATTERN.search(query)),
+            bool(LIST_PATTERN.search(query) and COMPANY_PATTERN.search(query)),
+            n,
+            per_df,
+        )
 
     def _join_dataframes(self, dataframes: Dict[str, pd.DataFrame]) -> Optional[pd.DataFrame]:
         """여러 DataFrame을 거래처 기준으로 조인 (거래처코드 ↔ 거래처명 매핑 지원)"""
@@ -141,35 +353,43 @@ class SmartAnalyst:
             name_to_code_map = {}
 
             for filename, df in dataframes.items():
-                if '거래처 코드' in df.columns and '거래처' in df.columns:
-                    for _, row in df[['거래처 코드', '거래처']].dropna().iterrows():
-                        code = str(row['거래처 코드']).strip()
-                        name = str(row['거래처']).strip()
-                        code_to_name_map[code] = name
-                        name_to_code_map[name] = code
-                elif '거래처 코드' in df.columns and '거래처명' in df.columns:
-                    for _, row in df[['거래처 코드', '거래처명']].dropna().iterrows():
-                        code = str(row['거래처 코드']).strip()
-                        name = str(row['거래처명']).strip()
-                        code_to_name_map[code] = name
-                        name_to_code_map[name] = code
+                cols = frozenset(df.columns)
+                if '거래처 코드' in cols and '거래처' in cols:
+                    name_col = '거래처'
+                elif '거래처 코드' in cols and '거래처명' in cols:
+                    name_col = '거래처명'
+                else:
+                    continue
+
+                # 행 단위 루프 대신 컬럼 단위로 문자열 변환 후 dict에 일괄 반영
+                sub = df[['거래처 코드', name_col]].dropna()
+                codes = sub['거래처 코드'].astype(str).str.strip().to_numpy()
+                names = sub[name_col].astype(str).str.strip().to_numpy()
+                code_to_name_map.update(zip(codes, names))
+                name_to_code_map.update(zip(names, codes))
 
             print(f"  → 거래처 매핑: 코드 {len(code_to_name_map)}개, 이름 {len(name_to_code_map)}개")
 
             # 2. 거래처 컬럼이 있는 파일들만 선택
             joinable_dfs = []
             for filename, df in dataframes.items():
-                if '거래처' in df.columns or '거래처명' in df.columns or '거래처 코드' in df.columns:
-                    df_copy = df.copy()
+                cols = frozenset(df.columns)
+                if '거래처' in cols or '거래처명' in cols or '거래처 코드' in cols:
+                    # 얕은 복사 (컬럼 추가/이름 변경만 하므로 데이터 버퍼는 공유)
+                    df_copy = df.copy(deep=False)
 
                     # 거래처 컬럼 통일 (우선순위: 거래처 > 거래처명 > 거래처 코드를 이름으로 변환)
-                    if '거래처' not in df_copy.columns:
-                        if '거래처명' in df_copy.columns:
+                    if '거래처' not in cols:
+                        if '거래처명' in cols:
                             df_copy['거래처'] = df_copy['거래처명']
-                        elif '거래처 코드' in df_copy.columns:
-                            # 거래처 코드를 거래처명으로 변환
-                            df_copy['거래처'] = df_copy['거래처 코드'].apply(
-                                lambda x: code_to_name_map.get(str(x).strip(), str(x)) if pd.notna(x) else None
+                        elif '거래처 코드' in cols:
+                            # 거래처 코드를 거래처명으로 변환 (매핑 없으면 코드 그대로, NULL 유지)
+                            codes = df_copy['거래처 코드']
+                            code_strs = codes.astype(str)
+                            df_copy['거래처'] = (
+                                code_strs.str.strip().map(code_to_name_map)
+                                .fillna(code_strs)
+                                .where(codes.notna())
                             )
                             print(f"  → {filename}: 거래처 코드 → 거래처명 변환")
 
@@ -182,12 +402,20 @@ class SmartAnalyst:
                         if col not in important_cols:
                             rename_dict[col] = f"{file_prefix}_{col}"
 
-                    df_copy = df_copy.rename(columns=rename_dict)
+                    df_copy.rename(columns=rename_dict, inplace=True)
                     joinable_dfs.append((filename, df_copy))
 
             if len(joinable_dfs) < 2:
                 return None
 
+            # 모든 파일의 거래처를 하나의 카테고리로 인코딩 → 문자열 대신 정수 코드로 조인
+            vendor_keys = pd.concat(
+                [df['거래처'] for _, df in joinable_dfs], ignore_index=True
+            ).dropna().unique()
+            vendor_dtype = pd.CategoricalDtype(categories=vendor_keys)
+            for _, df in joinable_dfs:
+                df['거래처'] = df['거래처'].astype(vendor_dtype)
+
             # 3. 첫 번째 DataFrame부터 순차적으로 조인
             result_df = joinable_dfs[0][1]
             print(f"  → 조인 시작: {joinable_dfs[0][0]} ({len(result_df):,}행)")
@@ -202,6 +430,7 @@ class SmartAnalyst:
                     df,
                     on='거래처',
                     how='outer',
+                    sort=False,
                     suffixes=('', f'_{i}')
                 )
 
@@ -240,23 +469,23 @@ class SmartAnalyst:
 
         # ===== PANDAS 계산 추가 =====
         # 상위 N개 요청 (매출 상위, 거래처 상위 등)
-        if any(word in query for word in ['상위', 'top', '많이', '높은', '순위']):
+        if RANK_PATTERN.search(query):
             calculated_data = self._calculate_top_n(query, df)
             if calculated_data:
                 relevant_parts.append("=== 계산된 결과 (Pandas 집계) ===")
                 relevant_parts.append(calculated_data)
 
         # 합계/평균 요청
-        elif any(word in query for word in ['합계', '총', '평균', '총합']):
+        elif AGG_PATTERN.search(query):
             calculated_data = self._calculate_aggregates(query, df)
             if calculated_data:
                 relevant_parts.append("=== 계산된 결과 (Pandas 집계) ===")
                 relevant_parts.append(calculated_data)
 
         # 전체 회사/거래처 목록 요청
-        elif any(word in query for word in ['전체', '모든', '리스트', '목록']) and any(word in query for word in ['회사', '거래처', '업체']):
-            if '거래처' in df.columns or '거래처명' in df.columns:
-                col_name = '거래처' if '거래처' in df.columns else '거래처명'
+        elif LIST_PATTERN.search(query) and COMPANY_PATTERN.search(query):
+            col_name = profile_columns(df)['vendor_col']
+            if col_name:
                 unique_companies = df[col_name].unique()
                 relevant_parts.append(f"\n전체 거래처 목록 ({len(unique_companies)}개):")
                 relevant_parts.append(", ".join([str(c) for c in unique_companies[:100]]))  # 최대 100개
@@ -267,11 +496,11 @@ class SmartAnalyst:
                 relevant_parts.append(f"관련 컬럼: {', '.join(matching_cols)}")
                 # 더 많은 샘플 데이터 (5개 → 20개)
                 sample_df = df[matching_cols].head(20)
-                relevant_parts.append(sample_df.to_string())
+                relevant_parts.append(_sample_to_text(sample_df))
             else:
                 # 전체 데이터 샘플
                 relevant_parts.append("데이터 샘플 (처음 20행):")
-                relevant_parts.append(df.head(20).to_string())
+                relevant_parts.append(_sample_to_text(df.head(20)))
 
         return "\n".join(relevant_parts) if relevant_parts else ""
 
@@ -286,20 +515,22 @@ class SmartAnalyst:
                     break
 
             results = []
+            profile = profile_columns(df)
 
             # 거래처별 매출 집계
-            if '거래처' in df.columns:
-                # 매출 관련 숫자 컬럼 찾기 (날짜 컬럼 제외)
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                amount_cols = [col for col in numeric_cols
-                             if any(keyword in col for keyword in ['합계', '금액', '공급가액', '부가세'])
-                             and '번호' not in col and '코드' not in col]
+            if '거래처' in profile['columns']:
+                # 매출 관련 숫자 컬럼 (날짜 컬럼 제외)
+                amount_cols = profile['amount_cols']
 
                 if amount_cols:
                     for amount_col in amount_cols[:1]:  # 가장 중요한 컬럼 1개만 (합계 or 공급가액)
                         try:
-                            # 거래처별 집계 - 전체 데이터
-                            grouped = df.groupby('거래처')[amount_col].sum().sort_values(ascending=False)
+                            # 거래처별 집계 - 전체 데이터 (값 기준 정렬만 필요하므로 키 정렬 생략)
+                            grouped = (
+                                df.groupby('거래처', observed=True, sort=False)[amount_col]
+                                .sum()
+                                .sort_values(ascending=False)
+                            )
 
                             # 사용자가 N을 명시한 경우만 제한
                             if n:
@@ -313,25 +544,23 @@ class SmartAnalyst:
                                 else:
                                     results.append(f"\n[거래처별 {amount_col} 전체 ({len(grouped)}개)]")
 
-                            results.append("순위 | 거래처 | 금액")
-                            results.append("-" * 50)
-
-                            for rank, (company, value) in enumerate(grouped.items(), 1):
-                                results.append(f"{rank}위 | {company} | {value:,.0f}")
+                            results.append(_ranking_to_text(grouped, '거래처', amount_col))
                         except Exception as e:
                             print(f"컬럼 {amount_col} 계산 오류: {e}")
                             continue
 
             # 제품별 집계
-            if '품목명' in df.columns or '제품명' in df.columns or '거래 제품명' in df.columns:
-                product_col = '품목명' if '품목명' in df.columns else ('제품명' if '제품명' in df.columns else '거래 제품명')
-                amount_cols = [col for col in df.select_dtypes(include=['number']).columns
-                             if any(keyword in col for keyword in ['합계', '금액', '수량'])
-                             and '번호' not in col and '코드' not in col]
+            product_col = profile['product_col']
+            if product_col:
+                amount_cols = profile['product_amount_cols']
 
                 if amount_cols:
                     try:
-                        grouped = df.groupby(product_col)[amount_cols[0]].sum().sort_values(ascending=False)
+                        grouped = (
+                            df.groupby(product_col, observed=True, sort=False)[amount_cols[0]]
+                            .sum()
+                            .sort_values(ascending=False)
+                        )
 
                         if n:
                             grouped = grouped.head(n)
@@ -343,11 +572,7 @@ class SmartAnalyst:
                             else:
                                 results.append(f"\n[{product_col}별 {amount_cols[0]} 전체 ({len(grouped)}개)]")
 
-                        results.append("순위 | 제품 | 금액")
-                        results.append("-" * 50)
-
-                        for rank, (product, value) in enumerate(grouped.items(), 1):
-                            results.append(f"{rank}위 | {product} | {value:,.0f}")
+                        results.append(_ranking_to_text(grouped, product_col, amount_cols[0]))
                     except:
                         pass
 
@@ -362,34 +587,34 @@ class SmartAnalyst:
         try:
             results = []
 
-            # 숫자 컬럼만 선택
-            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-
-            # 번호, 코드 같은 의미없는 컬럼 제외
-            exclude_keywords = ['번호', '코드', 'id', 'index']
-            meaningful_cols = [col for col in numeric_cols
-                             if not any(keyword in col.lower() for keyword in exclude_keywords)]
+            # 숫자 컬럼 중 번호, 코드 같은 의미없는 컬럼 제외
+            profile = profile_columns(df)
+            meaningful_cols = profile['meaningful_cols']
 
             if meaningful_cols:
                 results.append("[전체 데이터 집계]")
                 results.append("컬럼 | 합계 | 평균 | 최대 | 최소")
                 results.append("-" * 70)
 
-                for col in meaningful_cols[:10]:  # 최대 10개
-                    total = df[col].sum()
-                    mean = df[col].mean()
-                    max_val = df[col].max()
-                    min_val = df[col].min()
-
-                    results.append(f"{col} | {total:,.0f} | {mean:,.1f} | {max_val:,.0f} | {min_val:,.0f}")
+                # 컬럼별 합계/평균/최대/최소를 한 번에 계산 (최대 10개)
+                stats = df[meaningful_cols[:10]].agg(['sum', 'mean', 'max', 'min'])
+                for col, col_stats in stats.items():
+                    results.append(f"{col} | {col_stats['sum']:,.0f} | {col_stats['mean']:,.1f} | "
+                                   f"{col_stats['max']:,.0f} | {col_stats['min']:,.0f}")
 
             # 거래처별 집계 (있는 경우)
-            if '거래처' in df.columns and meaningful_cols:
+            if '거래처' in profile['columns'] and meaningful_cols:
                 results.append("\n[거래처별 집계 (상위 10개)]")
 
+                # 두 컬럼의 거래처별 합계/평균/건수를 한 번의 groupby로 계산
+                vendor_stats = (
+                    df.groupby('거래처', observed=True, sort=False)[meaningful_cols[:2]]
+                    .agg(['sum', 'mean', 'count'])
+                )
+
                 for col in meaningful_cols[:2]:
                     try:
-                        grouped = df.groupby('거래처')[col].agg(['sum', 'mean', 'count']).nlargest(10, 'sum')
+                        grouped = vendor_stats[col].nlargest(10, 'sum')
 
                         results.append(f"\n{col}:")
                         results.append("거래처 | 합계 | 평균 | 건수")
@@ -408,64 +633,97 @@ class SmartAnalyst:
 
     def _extract_company_name(self, query: str, df: pd.DataFrame) -> Optional[str]:
         """질문에서 거래처명 추출"""
-        if '거래처' not in df.columns and '거래처명' not in df.columns:
+        col_name = profile_columns(df)['vendor_col']
+        if col_name is None:
+            return None
+
+        # 오토마톤으로 질문 한 번만 스캔 (가장 긴 거래처명 우선)
+        automaton = self._get_company_automaton(df, col_name)
+        if automaton is not None:
+            matches = [name for _, name in automaton.iter(query)]
+            return max(matches, key=len) if matches else None
+
+        all_companies = [name for name in df[col_name].dropna().astype(str).unique() if name]
+        if not all_companies:
             return None
 
-        col_name = '거래처' if '거래처' in df.columns else '거래처명'
-        all_companies = df[col_name].unique()
+        # 거래처명 최대 길이 이하의 질문 부분 문자열을 모아 집합 조회로 매칭 (가장 긴 거래처명 우선)
+        max_len = max(map(len, all_companies))
+        candidates = {
+            query[i:j]
+            for i in range(len(query))
+            for j in range(i + 1, min(i + max_len, len(query)) + 1)
+        }
+        matches = [name for name in all_companies if name in candidates]
+        return max(matches, key=len) if matches else None
+
+    def _get_company_automaton(self, df: pd.DataFrame, col_name: str):
+        """DataFrame별 거래처명 Aho-Corasick 오토마톤 (pyahocorasick 미설치 시 None)"""
+        if ahocorasick is None:
+            return None
 
-        # 질문에서 실제 거래처명 찾기
-        for company in all_companies:
-            if pd.notna(company) and str(company) in query:
-                return str(company)
+        with self._automaton_lock:
+            entry = self._company_automaton.get(id(df))
+            if entry is not None and entry[0]() is df:
+                return entry[1]
+
+            automaton = ahocorasick.Automaton()
+            for name in df[col_name].dropna().unique():
+                name = str(name)
+                if name:
+                    automaton.add_word(name, name)
+            if len(automaton) == 0:
+                return None
+            automaton.make_automaton()
 
-        return None
+            # 해제된 DataFrame의 오토마톤 정리 후 저장
+            for key in [key for key, value in self._company_automaton.items() if value[0]() is None]:
+                del self._company_automaton[key]
+            self._company_automaton[id(df)] = (weakref.ref(df), automaton)
+            return automaton
 
     def _analyze_specific_company(self, company_name: str, df: pd.DataFrame, query: str) -> str:
         """특정 거래처에 대한 상세 분석"""
         try:
-            col_name = '거래처' if '거래처' in df.columns else '거래처명'
+            profile = profile_columns(df)
+            col_name = profile['vendor_col']
 
-            # 해당 거래처 데이터 필터링
-            company_data = df[df[col_name] == company_name].copy()
+            # 해당 거래처 행 위치만 계산 (전체 프레임 복사 없이 필요한 컬럼만 인덱싱)
+            idx = np.flatnonzero((df[col_name] == company_name).to_numpy())
 
-            if len(company_data) == 0:
+            if len(idx) == 0:
                 return f"'{company_name}' 거래처의 데이터를 찾을 수 없습니다."
 
             results = []
             results.append(f"\n[{company_name} 거래처 상세 분석]")
-            results.append(f"총 거래 건수: {len(company_data):,}건\n")
+            results.append(f"총 거래 건수: {len(idx):,}건\n")
 
-            # 숫자 컬럼 집계
-            numeric_cols = company_data.select_dtypes(include=['number']).columns.tolist()
-            exclude_keywords = ['번호', '코드', 'id', 'index']
-            meaningful_cols = [col for col in numeric_cols
-                             if not any(keyword in col.lower() for keyword in exclude_keywords)]
+            # 숫자 컬럼 집계 (행 필터링이므로 원본과 컬럼 구성 동일)
+            meaningful_cols = profile['meaningful_cols']
 
             if meaningful_cols:
                 results.append("**주요 수치 집계**:")
                 results.append("항목 | 합계 | 평균 | 최대 | 최소")
                 results.append("-" * 70)
 
-                for col in meaningful_cols[:10]:
-                    total = company_data[col].sum()
-                    mean = company_data[col].mean()
-                    max_val = company_data[col].max()
-                    min_val = company_data[col].min()
-                    results.append(f"{col} | {total:,.0f} | {mean:,.1f} | {max_val:,.0f} | {min_val:,.0f}")
+                stats = df[meaningful_cols[:10]].iloc[idx].agg(['sum', 'mean', 'max', 'min'])
+                for col, col_stats in stats.items():
+                    results.append(f"{col} | {col_stats['sum']:,.0f} | {col_stats['mean']:,.1f} | "
+                                   f"{col_stats['max']:,.0f} | {col_stats['min']:,.0f}")
 
-            # 연도별 분석 (매출일 컬럼이 있는 경우)
-            if '매출일' in company_data.columns or '거래일' in company_data.columns or '일자' in company_data.columns:
-                date_col = '매출일' if '매출일' in company_data.columns else ('거래일' if '거래일' in company_data.columns else '일자')
+            sales = df['합계'].to_numpy()[idx] if '합계' in profile['columns'] else None
 
+            # 연도별 분석 (매출일 컬럼이 있는 경우)
+            dates = None
+            date_col = profile['date_col']
+            if date_col:
                 try:
-                    # 날짜 파싱
-                    company_data[date_col] = pd.to_datetime(company_data[date_col], errors='coerce')
-                    company_data['연도'] = company_data[date_col].dt.year
+                    # 날짜 파싱 (해당 거래처 행만)
+                    dates = pd.to_datetime(df[date_col].to_numpy()[idx], errors='coerce')
 
                     # 연도별 집계
-                    if '합계' in company_data.columns:
-                        yearly = company_data.groupby('연도')['합계'].agg(['sum', 'count']).sort_index()
+                    if sales is not None:
+                        yearly = pd.Series(sales).groupby(dates.year.rename('연도')).agg(['sum', 'count']).sort_index()
 
                         results.append("\n**연도별 매출 추이**:")
                         results.append("연도 | 매출 합계 | 거래 건수")
@@ -477,27 +735,25 @@ class SmartAnalyst:
                     pass
 
             # 제품별 분석 (있는 경우)
-            product_cols = ['품목명', '제품명', '거래 제품명']
-            product_col = None
-            for col in product_cols:
-                if col in company_data.columns:
-                    product_col = col
-                    break
+            product_col = profile['product_col']
 
-            if product_col and '합계' in company_data.columns:
-                product_sales = company_data.groupby(product_col)['합계'].sum().sort_values(ascending=False).head(10)
+            if product_col and sales is not None:
+                products = df[product_col].to_numpy()[idx]
+                product_sales = pd.Series(sales).groupby(products, sort=False).sum().sort_values(ascending=False).head(10)
 
                 results.append(f"\n**주요 거래 제품 (상위 10개)**:")
-                results.append("제품명 | 매출 합계")
-                results.append("-" * 50)
-
-                for product, sales in product_sales.items():
-                    results.append(f"{product} | {sales:,.0f}")
+                results.append(_ranking_to_text(product_sales, '제품명', '매출 합계'))
 
-            # 전체 데이터 샘플 (최근 10건)
+            # 최근 거래 샘플 (날짜/제품/수치 컬럼만, 최근 10건)
             results.append("\n**최근 거래 내역 (10건)**:")
-            sample_data = company_data.tail(10)
-            results.append(sample_data.to_string(index=False))
+            sample_cols = [col for col in (date_col, product_col) if col] + meaningful_cols
+            if sample_cols:
+                sample_data = df.iloc[idx[-10:], df.columns.get_indexer(sample_cols)]
+            else:
+                sample_data = df.iloc[idx[-10:]]
+            if dates is not None:
+                sample_data = sample_data.assign(**{date_col: dates[-10:]})
+            results.append(_sample_to_text(sample_data, index=False))
 
             return "\n".join(results)
 
@@ -508,15 +764,15 @@ class SmartAnalyst:
     def _extract_keywords(self, query: str) -> List[str]:
         """질문에서 키워드 추출"""
         # 간단한 키워드 추출 (불용어 제거)
-        stopwords = ['을', '를', '이', '가', '은', '는', '의', '에', '에서', '으로', '부터', '까지',
-                     '해', '해주', '해줘', '알려', '알려줘', '보여', '보여줘', '분석', '설명']
-
         words = query.replace('?', '').replace(',', '').split()
-        keywords = [w.lower() for w in words if w not in stopwords and len(w) > 1]
+        keywords = [w.lower() for w in words if w not in STOPWORDS and len(w) > 1]
 
         return keywords
 
-    def _generate_analysis(self, query: str, data_context: str, include_images: bool, conversation_context=None) -> str:
+    def _generate_analysis(
+        self, query: str, data_context: str, include_images: bool, conversation_context=None,
+        on_chunk: Optional[Callable[[str], None]] = None
+    ) -> str:
         """Gemini로 분석 생성 (AI 판단 강화 + 대화 컨텍스트)"""
         print("🤖 Gemini 분석 중...")
 
@@ -524,7 +780,7 @@ class SmartAnalyst:
         if include_images:
             images = [f for f in self.upload_handler.uploaded_files if f.type == 'image']
             if images:
-                return self._generate_multimodal_analysis(query, data_context, images)
+                return self._generate_multimodal_analysis(query, data_context, images, on_chunk)
 
         # 대화 컨텍스트 구성
         context_str = ""
@@ -534,52 +790,184 @@ class SmartAnalyst:
                 context_str += f"{i}. 질문: {ctx['query']}\n"
                 context_str += f"   답변: {ctx['response'][:200]}...\n\n"  # 답변은 200자까지만
 
-        # 텍스트 전용 프롬프트
-        prompt = f"""당신은 **비즈니스 데이터 분석 전문가**입니다.
+        # 같은 데이터 컨텍스트가 반복되면 명시적 캐시 사용 (대화/질문만 새로 전송)
+        cached_model = self._get_cached_model(data_context)
+        if cached_model is not None:
+            streamed = []
+            try:
+                response = cached_model.generate_content(
+                    f"{context_str}\n**현재 질문**: {query}\n\n답변:", stream=True
+                )
+                return self._collect_stream(response, on_chunk, streamed)
+            except Exception as e:
+                # 이미 일부 응답을 전달했으면 재시도 시 답변이 중복되므로 받은 부분까지 반환
+                if streamed:
+                    return self._partial_response(streamed, e)
 
-사용자가 업로드한 데이터를 바탕으로 질문에 답변하세요.
-{context_str}
-**현재 질문**: {query}
+                # 캐시 만료/삭제 등 → 다음 호출에서 재생성, 이번에는 일반 요청
+                print(f"⚠ 캐시 기반 분석 실패, 일반 요청으로 재시도: {e}")
+                self._drop_cached_content(data_context)
 
-**업로드된 데이터 정보**:
-{data_context}
+        # 텍스트 전용 프롬프트 (고정 prefix → 대화/질문 순)
+        prompt = f"""{ANALYST_ROLE}
 
-**답변 작성 가이드**:
-1. **데이터 요약**: 업로드된 데이터의 핵심 내용
-2. **질문에 대한 답변**: 구체적인 수치와 함께 명확히 답변
-3. **인사이트 및 AI 판단**:
-   - 데이터에서 발견한 중요한 패턴/특징
-   - **연평균 성장률 (CAGR)**: 연도별 데이터가 있으면 성장률 계산 공식 = ((최종년도값/초기년도값)^(1/(년수-1)) - 1) × 100
-   - **거래 끊길 위험 분석**: 최근 3개월 매출이 이전 3개월 대비 50% 이상 감소한 거래처, 또는 거래 빈도가 급격히 줄어든 거래처
-   - **고객 등급별 특징**: R(Recency), F(Frequency), M(Monetary) 기준 충성고객, 잠재고객, 위험고객 분류
-   - **제품군별 트렌드**: 특정 제품군 매출 증가/감소 추세
-4. **제안 및 조언**:
-   - 의사결정에 도움되는 구체적 조언
-   - 주의가 필요한 거래처/제품
-   - 추가 분석이 필요한 부분
+{ANALYSIS_GUIDE}
 
-**중요 - 반드시 지켜야 할 규칙**:
-- 한국어로 답변
-- **위에 제공된 "계산된 결과" 섹션의 실제 회사명/제품명만 사용할 것**
-- **절대로 존재하지 않는 회사명을 지어내지 말 것 (예: "주식회사 가나다라", "베스트출판" 같은 가짜 이름 금지)**
-- **중국어 기업명을 한국어로 번역하지 말 것 (예: "쓰촨쉬홍 OPTO-전자"는 원문 그대로 사용)**
-- 구체적인 숫자/사실만 언급
-- 데이터에 없는 내용은 추측하지 말고 "데이터에 없음"이라고 명시
-- 제공된 pandas 계산 결과를 우선적으로 활용
-- 거래처 코드가 주어지면 반드시 거래처명으로 변환해서 답변
-- NULL/빈 값은 "데이터 없음" 또는 "-"로 표시
+**업로드된 데이터 정보**:
+{data_context}
+{context_str}
+**현재 질문**: {query}
 
 답변:"""
 
+        streamed = []
         try:
-            response = self.llm.generate_content(prompt)
-            return response.text
+            response = self.llm.generate_content(prompt, stream=True)
+            return self._collect_stream(response, on_chunk, streamed)
         except Exception as e:
+            if streamed:
+                return self._partial_response(streamed, e)
             print(f"✗ Gemini 오류: {e}")
             return f"분석 중 오류 발생: {e}\n\n데이터 컨텍스트:\n{data_context}"
 
+    def _collect_stream(
+        self, response, on_chunk: Optional[Callable[[str], None]] = None, parts: Optional[List[str]] = None
+    ) -> str:
+        """
+        스트리밍 응답을 조각 단위로 콜백에 전달하면서 전체 텍스트로 합침
+
+        Args:
+            response: generate_content(stream=True) 응답
+            on_chunk: 응답 조각을 받을 콜백
+            parts: 받은 조각을 모을 리스트 (중간에 실패해도 호출 측에서 이미 전달한 조각 확인용)
+        """
+        if parts is None:
+            parts = []
+
+        for chunk in response:
+            # 종료 사유/안전성 정보만 담긴 조각은 텍스트 part가 없음 (chunk.text 접근 시 ValueError)
+            if not chunk.candidates or not chunk.candidates[0].content.parts:
+                continue
+
+            text = chunk.text
+            parts.append(text)
+            if on_chunk is not None:
+                on_chunk(text)
+
+        if not parts:
+            # 차단 등으로 텍스트가 하나도 없으면 오류로 처리
+            raise ValueError(f"응답에 텍스트가 없습니다 (prompt_feedback: {getattr(response, 'prompt_feedback', None)})")
+
+        # usage_metadata는 스트림을 끝까지 읽은 뒤 채워짐
+        self._log_cache_usage(response)
+        return "".join(parts)
+
+    def _partial_response(self, parts: List[str], error: Exception) -> str:
+        """스트리밍 도중 실패 시 이미 전달한 부분 응답에 오류 안내를 덧붙임"""
+        print(f"✗ 응답 수신 중 오류 (부분 응답 반환): {error}")
+        return "".join(parts) + f"\n\n⚠ 응답 수신 중 오류가 발생해 답변이 일부만 표시되었습니다: {error}"
+
+    def _log_cache_usage(self, response):
+        """응답의 입력 토큰 중 캐시 적중 토큰 수 로깅"""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            print(f"  → 입력 {usage.prompt_token_count:,} 토큰 (캐시 적중 {usage.cached_content_token_count:,})")
+
+    def _get_cached_model(self, data_context: str) -> Optional[genai.GenerativeModel]:
+        """
+        역할/가이드 + data_context를 Gemini 명시적 캐시(CachedContent)에 올리고 캐시 기반 모델 반환
+
+        한 번만 쓰이는 컨텍스트에 토큰 계산/캐시 생성 요청을 보내지 않도록 같은 컨텍스트가
+        두 번째로 쓰일 때 생성. 업로드 파일이 바뀌면 이전 캐시는 모두 삭제
+
+        Returns:
+            캐시 기반 GenerativeModel (첫 사용, 최소 토큰 미달 또는 실패 시 None)
+        """
+        cache_key = hashlib.sha256(f"{PROMPT_VERSION}\n{data_context}".encode()).hexdigest()
+        fingerprint = self._files_fingerprint()
+
+        with self._cache_lock:
+            # 이전 업로드 파일 기준 컨텍스트는 다시 쓰이지 않음
+            if fingerprint != self._cache_fingerprint:
+                self._drop_cached_contents()
+                self._cache_fingerprint = fingerprint
+
+            entry = self._cache_map.get(cache_key)
+            if entry is not None:
+                self._cache_map.move_to_end(cache_key)
+                cache, expires_at = entry
+                if cache is None:
+                    return None  # 캐시 불가(토큰 부족/생성 실패)로 이미 판정됨
+                if time.time() < expires_at:
+                    return genai.GenerativeModel.from_cached_content(cached_content=cache)
+            elif cache_key not in self._cache_seen:
+                self._cache_seen.add(cache_key)
+                return None
+
+            try:
+                # 최소 토큰 수 미만이면 캐시 생성 불가
+                token_count = self.llm.count_tokens(data_context).total_tokens
+                if token_count < CONTEXT_CACHE_MIN_TOKENS:
+                    self._cache_map[cache_key] = (None, 0.0)
+                    return None
+
+                cache = caching.CachedContent.create(
+                    model=self.llm.model_name,
+                    display_name=cache_key[:32],
+                    system_instruction=f"{ANALYST_ROLE}\n\n{ANALYSIS_GUIDE}",
+                    contents=[f"**업로드된 데이터 정보**:\n{data_context}"],
+                    ttl=CONTEXT_CACHE_TTL
+                )
+                # 만료 직전 사용을 피하기 위해 1분 여유
+                self._cache_map[cache_key] = (cache, time.time() + CONTEXT_CACHE_TTL.total_seconds() - 60)
+                print(f"✓ 컨텍스트 캐시 생성 ({token_count:,} 토큰)")
+
+                # 오래 사용하지 않은 캐시부터 삭제해 개수 제한
+                while len(self._cache_map) > CONTEXT_CACHE_MAX_ENTRIES:
+                    _, (old_cache, _) = self._cache_map.popitem(last=False)
+                    self._delete_cached_content(old_cache)
+
+                return genai.GenerativeModel.from_cached_content(cached_content=cache)
+
+            except Exception as e:
+                # 같은 컨텍스트로 질문마다 재시도하지 않도록 캐시 불가로 기록
+                print(f"⚠ 컨텍스트 캐시 생성 실패: {e}")
+                self._cache_map[cache_key] = (None, 0.0)
+                return None
+
+    def _drop_cached_content(self, data_context: str):
+        """data_context의 명시적 캐시 삭제 (캐시 기반 요청 실패 시)"""
+        cache_key = hashlib.sha256(f"{PROMPT_VERSION}\n{data_context}".encode()).hexdigest()
+        with self._cache_lock:
+            entry = self._cache_map.pop(cache_key, None)
+        if entry is not None:
+            self._delete_cached_content(entry[0])
+
+    def _drop_cached_contents(self):
+        """모든 명시적 캐시 삭제 (_cache_lock을 잡은 상태에서 호출)"""
+        for cache, _ in self._cache_map.values():
+            self._delete_cached_content(cache)
+        self._cache_map.clear()
+        self._cache_seen.clear()
+
+    def _delete_cached_content(self, cache):
+        """CachedContent 삭제 (저장 비용 중단, 실패해도 TTL 후 자동 삭제)"""
+        if cache is None:
+            return
+
+        try:
+            cache.delete()
+        except Exception as e:
+            print(f"⚠ 컨텍스트 캐시 삭제 실패: {e}")
+
+    def release_context_cache(self):
+        """명시적 캐시 삭제 (업로드 파일을 모두 제거할 때 호출)"""
+        with self._cache_lock:
+            self._drop_cached_contents()
+
     def _generate_multimodal_analysis(
-        self, query: str, data_context: str, images: List[UploadedFile]
+        self, query: str, data_context: str, images: List[UploadedFile],
+        on_chunk: Optional[Callable[[str], None]] = None
     ) -> str:
         """이미지 포함 멀티모달 분석"""
         print(f"🖼️ 이미지 포함 분석 ({len(images)}개)")
@@ -587,24 +975,17 @@ class SmartAnalyst:
         # 이미지를 Gemini가 읽을 수 있는 형태로 변환
         image_parts = []
         for img_file in images[:5]:  # 최대 5개
-            # base64 → bytes
-            image_bytes = base64.b64decode(img_file.content)
+            # 업로드 시 저장한 원본 바이트 사용
             image_parts.append({
-                'mime_type': 'image/jpeg',
-                'data': image_bytes
+                'mime_type': img_file.mime_type or 'image/jpeg',
+                'data': img_file.raw_bytes
             })
 
+        # 고정 prefix (역할/가이드/테이블 데이터)
         prompt = f"""당신은 **비즈니스 데이터 분석 전문가**입니다.
 
 사용자가 업로드한 데이터(테이블 + 이미지/차트)를 바탕으로 질문에 답변하세요.
 
-**사용자 질문**: {query}
-
-**업로드된 테이블 데이터**:
-{data_context}
-
-**이미지/차트**: {len(images)}개 제공됨
-
 **답변 작성 가이드**:
 1. **이미지 분석**: 차트/그래프가 보여주는 핵심 내용
 2. **데이터 해석**: 테이블 데이터와 이미지를 종합 분석
@@ -616,17 +997,28 @@ class SmartAnalyst:
 - 이미지의 구체적 내용 언급 (예: "차트에서 2024년 매출이 급증")
 - 테이블 데이터와 이미지를 연결하여 해석
 
+**업로드된 테이블 데이터**:
+{data_context}
+
+**이미지/차트**: {len(images)}개 제공됨"""
+
+        # 가변 부분 (질문)
+        question = f"""**사용자 질문**: {query}
+
 답변:"""
 
+        streamed = []
         try:
-            # Gemini에 이미지 + 텍스트 전송
-            content_parts = [prompt] + image_parts
-            response = self.llm.generate_content(content_parts)
-            return response.text
+            # Gemini에 텍스트 + 이미지 + 질문 순서로 전송
+            content_parts = [prompt] + image_parts + [question]
+            response = self.llm.generate_content(content_parts, stream=True)
+            return self._collect_stream(response, on_chunk, streamed)
         except Exception as e:
+            if streamed:
+                return self._partial_response(streamed, e)
             print(f"✗ 멀티모달 분석 오류: {e}")
             # Fallback: 텍스트만 분석
-            return self._generate_analysis(query, data_context, include_images=False)
+            return self._generate_analysis(query, data_context, include_images=False, on_chunk=on_chunk)
 
     def _extract_results(self, query: str, data_context: str) -> tuple:
         """결과 테이블/차트 추출"""
@@ -637,9 +1029,9 @@ class SmartAnalyst:
         dataframes = self.upload_handler.get_all_dataframes()
 
         # 간단한 집계 수행
-        if any(word in query for word in ['상위', 'Top', '순위']):
+        if TOP_TABLE_PATTERN.search(query):
             for filename, df in dataframes.items():
-                numeric_cols = df.select_dtypes(include=['number']).columns
+                numeric_cols = profile_columns(df)['numeric_cols']
                 if len(numeric_cols) > 0:
                     # 첫 번째 숫자 컬럼 기준 정렬
                     sort_col = numeric_cols[0]
@@ -4,10 +4,38 @@ CSV, Excel, 이미지, PDF 지원
 """
 import pandas as pd
 import io
+import re
+import hashlib
+import functools
+import threading
+import weakref
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from pathlib import Path
-import base64
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import chardet
+except ImportError:
+    chardet = None
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+except ImportError:
+    pa = None
+    pacsv = None
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
 
 
 @dataclass
@@ -15,9 +43,73 @@ class UploadedFile:
     """업로드된 파일 정보"""
     name: str
     type: str  # 'csv', 'excel', 'image', 'pdf'
-    content: Any  # DataFrame or image data
+    content: Any  # DataFrame, image bytes or PDF bytes
     size: int
     summary: str
+    raw_bytes: Optional[bytes] = None  # 이미지/PDF 원본 바이트 (매 분석마다 base64 디코딩 방지)
+    mime_type: Optional[str] = None
+
+
+# id(df) → (df 약한 참조, 컬럼 구성, 컬럼 정보)
+_column_profiles: Dict[int, tuple] = {}
+_column_profiles_lock = threading.Lock()
+
+
+def profile_columns(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    숫자/금액/거래처/날짜/제품 컬럼 정보 계산 (DataFrame별로 캐시)
+
+    업로드 시점에 한 번 계산해 두고 분석 시에는 캐시를 그대로 사용.
+    df.attrs에 넣으면 df[col], df.head() 등 파생 객체마다 복사되므로
+    id(df)와 약한 참조로 따로 보관하고, 컬럼 구성이 같을 때만 재사용
+    """
+    columns = tuple(df.columns)
+    with _column_profiles_lock:
+        entry = _column_profiles.get(id(df))
+    if entry is not None and entry[0]() is df and entry[1] == columns:
+        return entry[2]
+
+    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+    exclude_keywords = ['번호', '코드', 'id', 'index']
+    cols = frozenset(columns)
+
+    profile = {
+        'columns': cols,  # 컬럼 존재 여부 확인용
+        'numeric_cols': numeric_cols,
+        # 거래처별 매출 집계용 금액 컬럼
+        'amount_cols': [col for col in numeric_cols
+                        if any(keyword in col for keyword in ['합계', '금액', '공급가액', '부가세'])
+                        and '번호' not in col and '코드' not in col],
+        # 제품별 집계용 금액/수량 컬럼
+        'product_amount_cols': [col for col in numeric_cols
+                                if any(keyword in col for keyword in ['합계', '금액', '수량'])
+                                and '번호' not in col and '코드' not in col],
+        # 번호, 코드 같은 의미없는 컬럼 제외
+        'meaningful_cols': [col for col in numeric_cols
+                            if not any(keyword in col.lower() for keyword in exclude_keywords)],
+        'vendor_col': next((c for c in ('거래처', '거래처명') if c in cols), None),
+        'date_col': next((c for c in ('매출일', '거래일', '일자') if c in cols), None),
+        'product_col': next((c for c in ('품목명', '제품명', '거래 제품명') if c in cols), None),
+    }
+
+    # 해제된 DataFrame의 항목 정리 후 저장
+    with _column_profiles_lock:
+        for key in [key for key, value in _column_profiles.items() if value[0]() is None]:
+            del _column_profiles[key]
+        _column_profiles[id(df)] = (weakref.ref(df), columns, profile)
+    return profile
+
+
+@functools.cache
+def _load_codebook() -> Optional[pd.DataFrame]:
+    """코드북 로드 (프로세스당 한 번만 읽고 모든 핸들러가 공유)"""
+    codebook_path = Path(__file__).parent / "데이터 db.csv"
+    if codebook_path.exists():
+        try:
+            return pd.read_csv(codebook_path, encoding='utf-8-sig')
+        except:
+            return None
+    return None
 
 
 class UploadHandler:
@@ -30,48 +122,124 @@ class UploadHandler:
         'pdf': ['.pdf']
     }
 
+    # 숫자 컬럼 판별 키워드 (정규식 한 번으로 검사)
+    NUMERIC_KEYWORD_PATTERN = re.compile('|'.join(map(re.escape, [
+        '합계', '금액', '가액', '세', '단가', '수량', '마진', '율', '%', '개', '건', '일', '월', '년', '점수'
+    ])))
+
+    # Polars가 중복 컬럼명에 붙이는 접미사
+    POLARS_DUPLICATE_PATTERN = re.compile(r'_duplicated_\d+$')
+
+    # 이 크기를 넘는 CSV는 Polars(멀티스레드 Rust 파서)로 우선 읽기
+    POLARS_MIN_BYTES = 10 * 1024 * 1024
+
+    # 처리 결과를 보관할 최근 업로드 수 (제거 후 다시 올린 파일은 파싱 생략)
+    UPLOAD_CACHE_SIZE = 4
+
+    # 숫자 변환 시 NULL로 취급할 값
+    NUMERIC_NULL_TOKENS = ['', 'nan', 'NaN', 'None', '-', ' ']
+
+    # 파일 시그니처(매직 바이트) → 이미지 MIME 타입
+    IMAGE_SIGNATURES = [
+        (b'\x89PNG\r\n\x1a\n', 'image/png'),
+        (b'\xff\xd8\xff', 'image/jpeg'),
+        (b'GIF87a', 'image/gif'),
+        (b'GIF89a', 'image/gif'),
+        (b'BM', 'image/bmp'),
+    ]
+
     def __init__(self):
         self.uploaded_files: List[UploadedFile] = []
-        self.codebook = self._load_codebook()
-
-    def _load_codebook(self) -> Optional[pd.DataFrame]:
-        """코드북 로드"""
-        codebook_path = Path(__file__).parent / "데이터 db.csv"
-        if codebook_path.exists():
-            try:
-                return pd.read_csv(codebook_path, encoding='utf-8-sig')
-            except:
-                return None
-        return None
+        # 파일명 → 파일, 파일명 → DataFrame 인덱스 (add_file/remove_file/clear_files에서 갱신)
+        self._by_name: Dict[str, UploadedFile] = {}
+        self._dataframes: Dict[str, pd.DataFrame] = {}
+        self.codebook = _load_codebook()
+        self._codebook_map = self._build_codebook_map(self.codebook)
+        # (파일 내용 해시, 파일명) → 처리 결과, 최근 사용 순 (파일 제거/전체 제거 후에도 유지)
+        self._upload_cache: "OrderedDict[tuple, UploadedFile]" = OrderedDict()
+
+    def _build_codebook_map(self, codebook: Optional[pd.DataFrame]) -> Dict[str, Dict[str, str]]:
+        """코드북을 파일 구분별 {번호: 항목} 딕셔너리로 미리 변환"""
+        if codebook is None:
+            return {}
+
+        try:
+            return {
+                file_type: dict(zip(group['번호'].astype(str), group['항목'].astype(str)))
+                for file_type, group in codebook.groupby('파일 구분', sort=False)
+            }
+        except KeyError:
+            return {}
 
     def _convert_numeric_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """문자열로 저장된 숫자 컬럼을 numeric 타입으로 변환 (강화)"""
-        for col in df.columns:
-            # 숫자 관련 키워드가 포함된 컬럼만 시도
-            numeric_keywords = ['합계', '금액', '가액', '세', '단가', '수량', '마진', '율', '%', '개', '건', '일', '월', '년', '점수']
+        # 숫자 관련 키워드가 포함된 문자열 컬럼만 시도
+        target_cols = [
+            col for col in df.columns
+            if self.NUMERIC_KEYWORD_PATTERN.search(str(col))
+            and (pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]))
+        ]
+
+        # 컬럼별 변환은 서로 독립적이므로 컬럼이 많으면 병렬 처리 (pandas 문자열/숫자 변환은 GIL 해제 구간 포함)
+        if len(target_cols) < 4:
+            converted = [self._clean_numeric_column(df[col]) for col in target_cols]
+        else:
+            with ThreadPoolExecutor(max_workers=min(8, len(target_cols))) as executor:
+                converted = list(executor.map(self._clean_numeric_column, (df[col] for col in target_cols)))
 
-            if any(keyword in col for keyword in numeric_keywords):
-                try:
-                    # 쉼표 제거 후 숫자로 변환
-                    if df[col].dtype == 'object':
-                        # 빈 문자열 또는 'nan'을 NaN으로 변환
-                        df[col] = df[col].replace(['', 'nan', 'NaN', 'None', '-', ' '], pd.NA)
+        for col, num in zip(target_cols, converted):
+            if num is not None:
+                df[col] = num
+                print(f"  → {col} 컬럼을 숫자로 변환 (NULL 값 유지)")
+
+        return df
+
+    def _clean_numeric_column(self, s: pd.Series) -> Optional[pd.Series]:
+        """문자열 컬럼 하나를 숫자로 변환 (숫자로 볼 수 없으면 None)"""
+        try:
+            # 빈 문자열 또는 'nan'을 NaN으로 변환
+            s = s.mask(s.isin(self.NUMERIC_NULL_TOKENS))
 
-                        # 문자열에서 쉼표, 공백, % 기호 제거
-                        df[col] = df[col].astype(str).str.replace(',', '').str.replace(' ', '').str.replace('%', '')
+            # 문자열이 아닌 값이 섞인 경우만 문자열로 변환 ('nan' 문자열 생성 방지)
+            if pd.api.types.infer_dtype(s, skipna=True) != 'string':
+                s = s.astype(str)
 
-                        # numeric으로 변환 (변환 불가능한 값은 NaN, 빈 값도 NaN)
-                        df[col] = pd.to_numeric(df[col], errors='coerce')
-                        print(f"  → {col} 컬럼을 숫자로 변환 (NULL 값 유지)")
-                except Exception as e:
-                    # 변환 실패해도 계속 진행
-                    pass
+            # 쉼표, 공백, % 기호를 정규식 한 번으로 제거
+            s = s.str.replace(r'[,\s%]', '', regex=True)
+
+            # numeric으로 변환 (변환 불가능한 값은 NaN, 빈 값도 NaN)
+            num = pd.to_numeric(s, errors='coerce')
+
+            # 값이 하나도 숫자로 읽히지 않으면 날짜 등 텍스트 컬럼이므로 유지 (예: 매출일)
+            if num.notna().any() or not s.notna().any():
+                return num
+        except Exception:
+            # 변환 실패해도 계속 진행
+            pass
+
+        return None
+
+    def _downcast_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """정수 값만 있는 실수 컬럼은 int64로, 저카디널리티 문자열 컬럼은 category로 변환"""
+        for col in df.columns:
+            s = df[col]
+            try:
+                if pd.api.types.is_float_dtype(s) and s.notna().all() and (s % 1 == 0).all():
+                    # 단가×수량 등 원소별 연산이 조용히 오버플로하지 않도록 int8/16/32로 줄이지 않고,
+                    # 금액 정밀도 보호를 위해 실수도 float32로 줄이지 않음
+                    df[col] = s.astype('int64')
+                elif (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)) and len(s) > 0:
+                    if s.nunique() / len(s) < 0.5:
+                        df[col] = s.astype('category')
+            except Exception:
+                # 변환 실패 시 원래 타입 유지
+                continue
 
         return df
 
     def _apply_codebook(self, df: pd.DataFrame, filename: str) -> pd.DataFrame:
         """코드북을 사용해 컬럼명 변환"""
-        if self.codebook is None:
+        if not self._codebook_map:
             return df
 
         # 파일명에서 파일 구분 추출
@@ -91,19 +259,14 @@ class UploadHandler:
         if not file_type:
             return df
 
-        # 해당 파일 타입의 코드북 추출
-        mapping = self.codebook[self.codebook['파일 구분'] == file_type]
+        # 해당 파일 타입의 코드북 (초기화 시 생성한 매핑 사용)
+        mapping = self._codebook_map.get(file_type)
 
-        if len(mapping) == 0:
+        if not mapping:
             return df
 
         # 컬럼명 매핑 딕셔너리 생성
-        rename_dict = {}
-        for _, row in mapping.iterrows():
-            code = str(row['번호'])
-            name = str(row['항목'])
-            if code in df.columns:
-                rename_dict[code] = name
+        rename_dict = {col: mapping[col] for col in df.columns if col in mapping}
 
         # 컬럼명 변환
         if rename_dict:
@@ -174,19 +337,32 @@ class UploadHandler:
         file_ext = Path(filename).suffix.lower()
         file_type = self._detect_file_type(file_ext)
 
+        # 같은 내용/이름의 파일은 이전 처리 결과 재사용
+        cache_key = (hashlib.blake2b(file_bytes, digest_size=16).digest(), filename)
+        cached = self._upload_cache.get(cache_key)
+        if cached is not None:
+            self._upload_cache.move_to_end(cache_key)
+            print(f"📂 파일 처리: {filename} (캐시 사용)")
+            return cached
+
         print(f"📂 파일 처리: {filename} (타입: {file_type})")
 
         if file_type == 'csv':
-            return self._process_csv(file_bytes, filename)
+            result = self._process_csv(file_bytes, filename)
         elif file_type == 'excel':
-            return self._process_excel(file_bytes, filename)
+            result = self._process_excel(file_bytes, filename)
         elif file_type == 'image':
-            return self._process_image(file_bytes, filename)
+            result = self._process_image(file_bytes, filename)
         elif file_type == 'pdf':
-            return self._process_pdf(file_bytes, filename)
+            result = self._process_pdf(file_bytes, filename)
         else:
             raise ValueError(f"지원하지 않는 파일 형식: {file_ext}")
 
+        self._upload_cache[cache_key] = result
+        if len(self._upload_cache) > self.UPLOAD_CACHE_SIZE:
+            self._upload_cache.popitem(last=False)
+        return result
+
     def _detect_file_type(self, file_ext: str) -> str:
         """파일 확장자로 타입 감지"""
         for file_type, extensions in self.SUPPORTED_FORMATS.items():
@@ -194,18 +370,103 @@ class UploadHandler:
                 return file_type
         return 'unknown'
 
+    def _detect_encoding(self, file_bytes) -> Optional[str]:
+        """앞부분 64KB로 인코딩 감지 (chardet 미설치 또는 감지 실패 시 None)"""
+        if chardet is None:
+            return None
+
+        encoding = chardet.detect(bytes(file_bytes[:65536]))['encoding']
+        if not encoding:
+            return None
+
+        # 한글 인코딩은 상위 호환인 cp949로 통일, latin-1 등 단일바이트 추정은 신뢰하지 않음
+        encoding = encoding.lower()
+        if encoding in ('euc-kr', 'cp949', 'uhc'):
+            return 'cp949'
+        if encoding in ('utf-8', 'utf-8-sig', 'ascii'):
+            return 'utf-8-sig'
+        return None
+
+    def _read_csv_arrow(self, file_bytes, encoding: Optional[str]) -> Optional[pd.DataFrame]:
+        """pyarrow 멀티스레드 CSV 파서로 읽기 (미설치 또는 파싱/디코딩 실패 시 None)"""
+        if pacsv is None:
+            return None
+
+        # UTF-8 BOM은 pyarrow가 자체 처리, 그 외 인코딩은 pyarrow가 UTF-8로 변환 후 파싱
+        if encoding in (None, 'utf-8-sig'):
+            encoding = 'utf8'
+
+        read_options = pacsv.ReadOptions(encoding=encoding, block_size=8 << 20)
+        try:
+            table = pacsv.read_csv(
+                io.BytesIO(file_bytes),
+                read_options=read_options,
+                convert_options=pacsv.ConvertOptions(strings_can_be_null=True)
+            )
+
+            # 중복 컬럼명은 pandas처럼 '.1' 접미사를 붙이지 않으므로 pandas 파서에 맡김
+            if len(set(table.column_names)) != table.num_columns:
+                return None
+
+            # pyarrow는 날짜/시간 문자열을 date/timestamp로 변환하므로
+            # pandas 파서와 같은 결과가 되도록 해당 컬럼만 문자열로 다시 읽음
+            temporal_cols = [field.name for field in table.schema if pa.types.is_temporal(field.type)]
+            if temporal_cols:
+                table = pacsv.read_csv(
+                    io.BytesIO(file_bytes),
+                    read_options=read_options,
+                    convert_options=pacsv.ConvertOptions(
+                        strings_can_be_null=True,
+                        column_types={col: pa.string() for col in temporal_cols}
+                    )
+                )
+
+            return table.to_pandas()
+        except Exception:
+            return None
+
+    def _read_csv_polars(self, file_bytes, encoding: Optional[str]) -> Optional[pd.DataFrame]:
+        """Polars로 대용량 CSV 읽기 (미설치, UTF-8 외 인코딩, 파싱 실패 시 None)"""
+        if pl is None or encoding not in (None, 'utf-8-sig'):
+            return None
+
+        # Polars는 UTF-8만 지원하므로 BOM은 건너뛰고 전달
+        data = memoryview(file_bytes)
+        if bytes(data[:3]) == b'\xef\xbb\xbf':
+            data = data[3:]
+
+        try:
+            # 날짜 문자열은 pandas 파서와 같이 문자열로 유지
+            df = pl.read_csv(io.BytesIO(data), try_parse_dates=False).to_pandas()
+        except Exception:
+            return None
+
+        # 중복 컬럼명은 pandas와 다르게('_duplicated_0') 바뀌므로 pandas 파서에 맡김
+        if any(self.POLARS_DUPLICATE_PATTERN.search(str(col)) for col in df.columns):
+            return None
+        return df
+
     def _process_csv(self, file_bytes, filename: str) -> UploadedFile:
         """CSV 파일 처리"""
-        # 인코딩 자동 감지
+        # 인코딩 자동 감지 (감지된 인코딩을 먼저 시도하고 실패 시 나머지 순서대로)
         encodings = ['utf-8-sig', 'utf-8', 'cp949', 'euc-kr', 'latin-1']
+        detected = self._detect_encoding(file_bytes)
+        if detected:
+            encodings = [detected] + [enc for enc in encodings if enc != detected]
 
+        # 대용량은 Polars, 그 외 pyarrow 멀티스레드 파서 우선, 실패 시 pandas로 인코딩별 재시도
         df = None
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(io.BytesIO(file_bytes), encoding=encoding)
-                break
-            except:
-                continue
+        if len(file_bytes) > self.POLARS_MIN_BYTES:
+            df = self._read_csv_polars(file_bytes, detected)
+        if df is None:
+            df = self._read_csv_arrow(file_bytes, detected)
+        if df is None:
+            for encoding in encodings:
+                try:
+                    df = pd.read_csv(io.BytesIO(file_bytes), encoding=encoding)
+                    break
+                except:
+                    continue
 
         if df is None:
             raise ValueError("CSV 파일을 읽을 수 없습니다")
@@ -219,6 +480,9 @@ class UploadHandler:
         # 숫자 컬럼 타입 변환 (문자열로 저장된 숫자를 numeric으로 변환)
         df = self._convert_numeric_columns(df)
 
+        # 메모리 절감 (정수 다운캐스트, 반복 값이 많은 문자열 컬럼은 category)
+        df = self._downcast_columns(df)
+
         summary = self._generate_dataframe_summary(df)
 
         return UploadedFile(
@@ -231,7 +495,9 @@ class UploadHandler:
 
     def _process_excel(self, file_bytes, filename: str) -> UploadedFile:
         """Excel 파일 처리"""
-        df = pd.read_excel(io.BytesIO(file_bytes))
+        # calamine(Rust) 엔진이 있으면 사용, 없으면 pandas 기본 엔진(openpyxl/xlrd)
+        engine = 'calamine' if python_calamine is not None else None
+        df = pd.read_excel(io.BytesIO(file_bytes), engine=engine)
         summary = self._generate_dataframe_summary(df)
 
         return UploadedFile(
@@ -244,29 +510,42 @@ class UploadHandler:
 
     def _process_image(self, file_bytes, filename: str) -> UploadedFile:
         """이미지 파일 처리"""
-        # base64 인코딩하여 저장
-        image_b64 = base64.b64encode(file_bytes).decode()
+        # 원본 바이트 하나만 저장 (content/raw_bytes가 같은 객체 공유, base64 사본은 만들지 않음)
+        image_bytes = bytes(file_bytes)
 
         summary = f"이미지 파일: {filename} ({len(file_bytes):,} bytes)"
 
         return UploadedFile(
             name=filename,
             type='image',
-            content=image_b64,
+            content=image_bytes,
             size=len(file_bytes),
-            summary=summary
+            summary=summary,
+            raw_bytes=image_bytes,
+            mime_type=self._detect_image_mime(file_bytes)
         )
 
+    def _detect_image_mime(self, file_bytes) -> str:
+        """파일 앞부분 시그니처로 실제 이미지 MIME 타입 감지 (알 수 없으면 JPEG)"""
+        header = bytes(file_bytes[:8])
+        for signature, mime_type in self.IMAGE_SIGNATURES:
+            if header.startswith(signature):
+                return mime_type
+        return 'image/jpeg'
+
     def _process_pdf(self, file_bytes, filename: str) -> UploadedFile:
         """PDF 파일 처리"""
         summary = f"PDF 파일: {filename} ({len(file_bytes):,} bytes)"
+        pdf_bytes = bytes(file_bytes)
 
         return UploadedFile(
             name=filename,
             type='pdf',
-            content=file_bytes,
+            content=pdf_bytes,
             size=len(file_bytes),
-            summary=summary
+            summary=summary,
+            raw_bytes=pdf_bytes,
+            mime_type='application/pdf'
         )
 
     def _generate_dataframe_summary(self, df: pd.DataFrame) -> str:
@@ -276,9 +555,9 @@ class UploadHandler:
         lines.append(f"열 수: {len(df.columns)}")
         lines.append(f"\n컬럼 목록:")
 
-        for col in df.columns[:20]:  # 최대 20개
-            dtype = df[col].dtype
-            non_null = df[col].count()
+        # 표시할 컬럼의 타입/값 개수를 한 번에 계산 (최대 20개)
+        shown = df.iloc[:, :20]
+        for col, dtype, non_null in zip(shown.columns, shown.dtypes, shown.count()):
             lines.append(f"  - {col} ({dtype}): {non_null:,}개 값")
 
         if len(df.columns) > 20:
@@ -286,33 +565,62 @@ class UploadHandler:
 
         # 샘플 데이터
         lines.append(f"\n샘플 데이터 (처음 3행):")
-        lines.append(df.head(3).to_string())
+        # 넓은 표에서도 포맷 비용이 커지지 않도록 앞 10개 컬럼만 문자열화
+        preview = df.iloc[:3, :10].to_string()
+        if len(df.columns) > 10:
+            preview += f"\n... 외 {len(df.columns) - 10}개 컬럼"
+        lines.append(preview)
 
         return "\n".join(lines)
 
+    def _categorize_vendor_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """거래처 컬럼을 category로 변환 (groupby 시 문자열 대신 정수 코드로 해싱)"""
+        for col in ['거래처', '거래처명']:
+            if col in df.columns and df[col].dtype != 'category':
+                df[col] = df[col].astype('category')
+        return df
+
     def add_file(self, uploaded_file: UploadedFile):
         """파일 목록에 추가"""
+        if uploaded_file.type in ['csv', 'excel']:
+            uploaded_file.content = self._categorize_vendor_columns(uploaded_file.content)
+            profile_columns(uploaded_file.content)
+
         self.uploaded_files.append(uploaded_file)
+        self._by_name.setdefault(uploaded_file.name, uploaded_file)
+        if uploaded_file.type in ['csv', 'excel']:
+            self._dataframes[uploaded_file.name] = uploaded_file.content
         print(f"✓ 파일 추가: {uploaded_file.name}")
 
-    def get_all_dataframes(self) -> Dict[str, pd.DataFrame]:
-        """모든 DataFrame 반환"""
-        dataframes = {}
+    def remove_file(self, uploaded_file: UploadedFile):
+        """파일 목록에서 제거"""
+        self.uploaded_files.remove(uploaded_file)
+        self._rebuild_index()
+
+        print(f"✓ 파일 제거: {uploaded_file.name}")
+
+    def _rebuild_index(self):
+        """파일 목록으로 파일명 인덱스 재구성"""
+        self._by_name.clear()
+        self._dataframes.clear()
         for file in self.uploaded_files:
+            self._by_name.setdefault(file.name, file)
             if file.type in ['csv', 'excel']:
-                dataframes[file.name] = file.content
-        return dataframes
+                self._dataframes[file.name] = file.content
+
+    def get_all_dataframes(self) -> Dict[str, pd.DataFrame]:
+        """모든 DataFrame 반환"""
+        return dict(self._dataframes)
 
     def get_file_by_name(self, name: str) -> Optional[UploadedFile]:
         """파일명으로 검색"""
-        for file in self.uploaded_files:
-            if file.name == name:
-                return file
-        return None
+        return self._by_name.get(name)
 
     def clear_files(self):
         """모든 파일 제거"""
         self.uploaded_files.clear()
+        self._by_name.clear()
+        self._dataframes.clear()
         print("✓ 모든 파일 제거됨")
 
 
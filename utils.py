@@ -1,12 +1,57 @@
 """
 유틸리티 함수 모음
 """
+import io
 import re
 import pandas as pd
+from pathlib import Path
 from typing import Optional
 from config import ENCODINGS, SENSITIVE_PATTERNS
 
 
+def _mask_business_number(match: re.Match) -> str:
+    """214-86-59900 -> 214-**-***00"""
+    parts = match[0].split("-")
+    if len(parts) == 3:
+        return f"{parts[0]}-**-***{parts[2][-2:]}"
+    return match[0]
+
+
+def _mask_resident_number(match: re.Match) -> str:
+    """123456-1234567 -> 123456-*******"""
+    parts = match[0].split("-")
+    if len(parts) == 2:
+        return f"{parts[0]}-*******"
+    return match[0]
+
+
+def _mask_phone(match: re.Match) -> str:
+    """010-1234-5678 -> 010-****-5678 (가운데 자리수 유지)"""
+    parts = match[0].split("-")
+    if len(parts) == 3:
+        return f"{parts[0]}-{'*' * len(parts[1])}-{parts[2]}"
+    return match[0]
+
+
+# 민감정보 유형별 치환 함수 (정규식은 config.SENSITIVE_PATTERNS 사용)
+_MASKERS = {
+    "사업자등록번호": _mask_business_number,
+    "주민등록번호": _mask_resident_number,
+    "전화번호": _mask_phone,
+}
+
+# (컴파일된 정규식, 치환 함수) - import 시 한 번만 컴파일
+MASK_RULES = [
+    (re.compile(pattern), _MASKERS[info_type])
+    for info_type, pattern in SENSITIVE_PATTERNS.items()
+    if info_type in _MASKERS
+]
+
+
+# 날짜 후보 값 형태 (연-월-일 순서, 4자리 연도)
+DATE_SHAPE_PATTERN = re.compile(r"\s*\d{4}[-./]\d{1,2}[-./]\d{1,2}")
+
+
 def load_csv_with_fallback(file_path: str) -> Optional[pd.DataFrame]:
     """
     여러 인코딩을 시도하며 CSV 파일을 로드합니다.
@@ -17,16 +62,23 @@ def load_csv_with_fallback(file_path: str) -> Optional[pd.DataFrame]:
     Returns:
         DataFrame 또는 None
     """
+    # 파일은 한 번만 읽고 인코딩별 시도는 메모리 버퍼에서 수행
+    try:
+        data = Path(file_path).read_bytes()
+    except FileNotFoundError:
+        print(f"✗ 파일을 찾을 수 없습니다: {file_path}")
+        return None
+    except Exception as e:
+        print(f"✗ 파일 로드 중 오류: {file_path}, {e}")
+        return None
+
     for encoding in ENCODINGS:
         try:
-            df = pd.read_csv(file_path, encoding=encoding)
+            df = pd.read_csv(io.BytesIO(data), encoding=encoding)
             print(f"✓ {file_path} 로드 성공 (encoding: {encoding})")
             return df
         except (UnicodeDecodeError, UnicodeError):
             continue
-        except FileNotFoundError:
-            print(f"✗ 파일을 찾을 수 없습니다: {file_path}")
-            return None
         except Exception as e:
             print(f"✗ 파일 로드 중 오류: {file_path}, {e}")
             return None
@@ -50,31 +102,31 @@ def mask_sensitive_info(text: str) -> str:
 
     masked_text = text
 
-    for info_type, pattern in SENSITIVE_PATTERNS.items():
-        def mask_match(match):
-            original = match.group(0)
-            if info_type == "사업자등록번호":
-                # 214-86-59900 -> 214-**-***00
-                parts = original.split("-")
-                if len(parts) == 3:
-                    return f"{parts[0]}-**-***{parts[2][-2:]}"
-            elif info_type == "주민등록번호":
-                # 123456-1234567 -> 123456-*******
-                parts = original.split("-")
-                if len(parts) == 2:
-                    return f"{parts[0]}-*******"
-            elif info_type == "전화번호":
-                # 010-1234-5678 -> 010-****-5678
-                parts = original.split("-")
-                if len(parts) == 3:
-                    return f"{parts[0]}-{'*' * len(parts[1])}-{parts[2]}"
-            return original
-
-        masked_text = re.sub(pattern, mask_match, masked_text)
+    for pattern, masker in MASK_RULES:
+        masked_text = pattern.sub(masker, masked_text)
 
     return masked_text
 
 
+def mask_sensitive_info_series(series: pd.Series) -> pd.Series:
+    """
+    Series 전체의 민감정보를 마스킹합니다.
+
+    Args:
+        series: 원본 Series
+
+    Returns:
+        마스킹된 Series
+    """
+    if not pd.api.types.is_string_dtype(series):
+        series = series.astype(str)
+
+    for pattern, masker in MASK_RULES:
+        series = series.str.replace(pattern, masker, regex=True)
+
+    return series
+
+
 def clean_column_name(col_name: str) -> str:
     """
     컬럼명을 정리합니다.
@@ -161,6 +213,9 @@ def extract_date_columns(df: pd.DataFrame) -> list:
     """
     date_columns = []
 
+    # 데이터 타입 확인 (datetime 컬럼을 한 번에 조회)
+    datetime_cols = set(df.select_dtypes(include=['datetime', 'datetimetz']).columns)
+
     for col in df.columns:
         col_lower = str(col).lower()
         # 날짜 관련 키워드 확인
@@ -168,21 +223,23 @@ def extract_date_columns(df: pd.DataFrame) -> list:
             date_columns.append(col)
             continue
 
-        # 데이터 타입 확인
+        if col in datetime_cols:
+            date_columns.append(col)
+            continue
+
+        # 샘플 데이터로 날짜 형식 확인 (숫자 컬럼은 epoch로 해석되므로 제외)
         try:
-            if pd.api.types.is_datetime64_any_dtype(df[col]):
-                date_columns.append(col)
+            values = df[col]
+            if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
                 continue
-        except:
-            pass
 
-        # 샘플 데이터로 날짜 형식 확인
-        try:
-            sample = df[col].dropna().head(10)
+            sample = values.dropna().head(20).astype(str)
             if len(sample) > 0:
-                # YYYY-MM-DD 또는 YYYY.MM.DD 형식 확인
-                date_pattern = r'\d{4}[-./]\d{1,2}[-./]\d{1,2}'
-                if sample.astype(str).str.match(date_pattern).any():
+                # YYYY-MM-DD / YYYY.MM.DD / YYYY/MM/DD 형태인 값만 한 번에 파싱해
+                # 70% 이상이 실제 날짜면 날짜 컬럼 ('10:30', '2024', 'Jan' 등은 형태에서 제외)
+                shaped = sample[sample.str.match(DATE_SHAPE_PATTERN)]
+                parsed = pd.to_datetime(shaped, errors='coerce', format='mixed')
+                if parsed.notna().sum() / len(sample) > 0.7:
                     date_columns.append(col)
         except:
             pass
@@ -212,3 +269,20 @@ def parse_date_safe(date_str) -> Optional[str]:
         pass
 
     return str(date_str)
+
+
+if __name__ == "__main__":
+    # 테스트: 민감정보 마스킹 (더 긴 숫자열 안의 부분 매칭 포함)
+    mask_cases = {
+        "010-1234-5678": "010-****-5678",
+        "02-123-4567": "02-***-4567",
+        "02-123-4567-8901": "02-***-4567-8901",
+        "010-123-4567-8901": "010-***-4567-8901",
+        "214-86-59900": "214-**-***00",
+        "123456-1234567": "123456-*******",
+    }
+    for original, expected in mask_cases.items():
+        masked = mask_sensitive_info(original)
+        assert masked == expected, f"{original}: {masked} != {expected}"
+        assert mask_sensitive_info_series(pd.Series([original]))[0] == expected
+    print(f"✓ 마스킹 테스트 {len(mask_cases)}건 통과")